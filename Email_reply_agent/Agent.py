@@ -10,10 +10,12 @@
 # - Update YOUR_GEMINI_API_KEY and other placeholders.
 
 import os
+import sys
 import time
-import json
+import operator
 from typing import TypedDict, Annotated, Sequence
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from google.oauth2.credentials import Credentials
@@ -23,17 +25,52 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 import base64
 from email.mime.text import MIMEText
+import gmail_batch
+import mime_text
+from ledger import Ledger, FETCHED, ASSESSED, DRAFTED, SENT, READ
+from gmail_sync import AdaptivePoller, GmailSync, SyncCheckpoint
+
+# Shared LLM gateway lives in ../common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.llm_gateway import FATAL, LLMError, LLMGateway, gateway_settings
+from common.llm_json import as_bool, parse_llm_json
+from common.stub_llm import StubChatModel
 
 # Set up Gemini API
 os.environ["GOOGLE_API_KEY"] = "YOUR_GEMINI_API_KEY"  # Replace with your Gemini API key
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+# Every LLM call goes through the gateway: adaptive concurrency, RPM/TPM limits,
+# retries and hedging (LLM_* env vars). LLM_STUB_URL swaps Gemini for the local stub.
+chat_model = (StubChatModel(os.environ['LLM_STUB_URL']) if os.environ.get('LLM_STUB_URL')
+              else ChatGoogleGenerativeAI(model="gemini-1.5-flash"))
+llm = LLMGateway(chat_model, name='email-llm', **gateway_settings())
 
 # Gmail API setup
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify', 'https://www.googleapis.com/auth/gmail.send']
 CREDS_FILE = 'credentials.json'  # Path to your Google API credentials.json
 TOKEN_FILE = 'token.json'  # Where to store the token
+SYNC_STATE_FILE = 'gmail_sync_state.json'  # Last processed Gmail historyId
+LEDGER_FILE = 'email_ledger.sqlite3'  # Per-message progress and cached LLM outputs
+POLL_MIN_INTERVAL = 10  # Seconds between polls while mail is arriving
+POLL_MAX_INTERVAL = 300  # Upper bound the interval backs off to while the inbox is quiet
+EMAIL_MODE = os.environ.get('EMAIL_MODE', 'parallel')  # 'parallel' fans out one branch per email; 'sequential' handles them one by one
+EMAIL_CONCURRENCY = int(os.environ.get('EMAIL_CONCURRENCY', '4'))  # Emails processed at once in parallel mode
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', '5'))  # Failed attempts before an email is given up on
+EMAIL_RETRY_DELAY = float(os.environ.get('EMAIL_RETRY_DELAY', '60'))  # Seconds before a failed email is retried; doubles each time
+EMAIL_TOKEN_BUDGET = int(os.environ.get('EMAIL_TOKEN_BUDGET', '800'))  # Approximate tokens of email body sent to the LLM
+
+gmail_service = None
+
+# Build the Gmail client once and reuse it; tests can inject a fake service here
+def set_gmail_service(service):
+    global gmail_service
+    gmail_service = service
 
 def get_gmail_service():
+    if gmail_service is None:
+        set_gmail_service(build_gmail_service())
+    return gmail_service
+
+def build_gmail_service():
     creds = None
     if os.path.exists(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
@@ -54,98 +91,306 @@ class AgentState(TypedDict):
     needs_reply: bool
     reply_draft: str
     sent: bool
+    history_id: str  # Sync checkpoint to commit once this cycle's emails are handled
+    fetched: int  # Number of new emails this cycle picked up (retries of failed ones excluded)
+    deferred: list  # Ids of failed emails whose retry isn't due yet
+    outbox: list  # Replies waiting to be sent in one batch at the end of the cycle
+
+# Parallel mode: each email gets its own branch, and branch outputs are merged
+# back into these lists as they finish
+class ParallelAgentState(TypedDict):
+    emails: list
+    history_id: str
+    fetched: int
+    deferred: list
+    outbox: Annotated[list, operator.add]
+    results: Annotated[list, operator.add]  # {'id', 'needs_reply'} (or 'error') per email
+    sent: bool
+
+class EmailTask(TypedDict):
+    email: dict
+
+# Incremental sync: full unread listing on first run, history changes afterwards
+gmail_sync = GmailSync(SyncCheckpoint(SYNC_STATE_FILE))
 
-# Node: Fetch new emails
+# Durable record of how far each message got, so a restart resumes instead of
+# repeating LLM calls or sends (see ledger.py; `python ledger.py` prints stats)
+ledger = Ledger(LEDGER_FILE)
+
+# Node: Fetch new emails (one batch request per 50 messages, masked to the fields used here)
 def fetch_emails(state: AgentState) -> AgentState:
     service = get_gmail_service()
-    results = service.users().messages().list(userId='me', labelIds=['INBOX'], q='is:unread -from:me').execute()
-    messages = results.get('messages', [])
-    emails = []
-    for msg in messages[:5]:  # Limit to 5 for safety
-        msg_data = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-        payload = msg_data['payload']
-        headers = payload['headers']
-        subject = next(h['value'] for h in headers if h['name'] == 'Subject')
-        from_email = next(h['value'] for h in headers if h['name'] == 'From')
-        body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8') if 'body' in payload else ''
-        emails.append({
-            'id': msg['id'],
-            'threadId': msg_data['threadId'],
-            'subject': subject,
-            'from': from_email,
-            'body': body
-        })
+    message_ids, history_id = gmail_sync.changed_message_ids(service)
+    # Already answered; flush_outbox finishes marking these read if that was interrupted
+    message_ids = [message_id for message_id in message_ids if not ledger.reached(message_id, SENT)]
+    # Emails that failed before are skipped once given up on, and held back
+    # (without fetching or calling the LLM) until their retry is due
+    now = time.time()
+    retries, deferred = set(), []
+    for message_id in list(message_ids):
+        entry = ledger.get(message_id)
+        if entry is None or not entry['failures']:
+            continue
+        if entry['gave_up'] or entry['retry_at'] > now:
+            message_ids.remove(message_id)
+            if not entry['gave_up']:
+                deferred.append(message_id)
+                ledger.note('retries_deferred')
+        else:
+            retries.add(message_id)
+    started = time.perf_counter()
+    messages, failed = gmail_batch.get_messages(service, message_ids)
+    # A 404 is mail deleted since it was listed; anything else must be fetched
+    # again, so fail the cycle and leave the checkpoint where it is
+    for error in failed.values():
+        if not (isinstance(error, HttpError) and error.resp.status == 404):
+            raise error
+    if messages:
+        ledger.record([msg['id'] for msg in messages], FETCHED,
+                      duration=(time.perf_counter() - started) / len(messages))
+    # History can report mail that has been read since it arrived
+    emails = [email_from_message(msg_data) for msg_data in messages
+              if 'UNREAD' in msg_data.get('labelIds', ['UNREAD'])]
     state['emails'] = emails
+    state['history_id'] = history_id
+    state['fetched'] = sum(1 for email in emails if email['id'] not in retries)
+    state['deferred'] = deferred
     return state
 
+def email_from_message(msg_data):
+    payload = msg_data['payload']
+    headers = payload.get('headers', [])
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '')
+    from_email = next((h['value'] for h in headers if h['name'] == 'From'), '')
+    # New text only: quoted history and signatures stripped, compacted to the token budget
+    body = mime_text.email_text(payload, EMAIL_TOKEN_BUDGET)
+    return {
+        'id': msg_data['id'],
+        'threadId': msg_data['threadId'],
+        'subject': subject,
+        'from': from_email,
+        'body': body
+    }
+
+# Per-email steps shared by the sequential and parallel graphs. LLM outputs
+# already in the ledger are reused rather than requested again.
+def email_needs_reply(email):
+    entry = ledger.get(email['id'])
+    if entry and entry['needs_reply'] is not None:
+        ledger.note('assess_reused')
+        return entry['needs_reply']
+    started = time.perf_counter()
+    needs_reply = assess_with_llm(email)
+    ledger.record(email['id'], ASSESSED, duration=time.perf_counter() - started, needs_reply=needs_reply)
+    return needs_reply
+
+def assess_with_llm(email):
+    prompt = SystemMessage(content="Determine if this email needs a reply. Output JSON: {'needs_reply': true/false}")
+    user_msg = HumanMessage(content=f"Subject: {email['subject']}\nBody: {email['body']}")
+    response = llm.invoke([prompt, user_msg])
+    # Tolerates fences, prose and the single quotes the prompt itself shows
+    result = parse_llm_json(response.content)
+    if result is None or 'needs_reply' not in result:
+        print(f"Unparseable assessment for email {email['id']}, treating as no reply needed: {response.content[:200]!r}")
+        return False
+    return as_bool(result['needs_reply'])
+
+def draft_reply(email):
+    entry = ledger.get(email['id'])
+    if entry and entry['draft'] is not None:
+        ledger.note('draft_reused')
+        return entry['draft']
+    started = time.perf_counter()
+    draft = draft_with_llm(email)
+    ledger.record(email['id'], DRAFTED, duration=time.perf_counter() - started, draft=draft)
+    return draft
+
+def draft_with_llm(email):
+    prompt = SystemMessage(content="""You are a helpful assistant. Draft a professional, concise reply.
+    Use business casual tone. Start with 'Hello,' end with 'Best regards,'.
+    Output plain text.""")
+    user_msg = HumanMessage(content=f"Subject: {email['subject']}\nBody: {email['body']}")
+    response = llm.invoke([prompt, user_msg])
+    return response.content
+
+def outbox_item(email, draft):
+    message = MIMEText(draft)
+    message['to'] = email['from']
+    message['subject'] = f"Re: {email['subject']}"
+    raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
+    return {'email_id': email['id'], 'body': {'raw': raw, 'threadId': email['threadId']}}
+
 # Node: Assess if reply needed
 def assess_reply(state: AgentState) -> AgentState:
     if not state['emails']:
+        state['needs_reply'] = False
         return state
     state['current_email'] = state['emails'].pop(0)
-    email = state['current_email']
-    prompt = SystemMessage(content="Determine if this email needs a reply. Output JSON: {'needs_reply': true/false}")
-    user_msg = HumanMessage(content=f"Subject: {email['subject']}\nBody: {email['body']}")
-    response = llm.invoke([prompt, user_msg])
-    try:
-        result = json.loads(response.content)
-        state['needs_reply'] = result.get('needs_reply', False)
-    except:
-        state['needs_reply'] = False
+    state['needs_reply'] = email_needs_reply(state['current_email'])
     return state
 
-# Conditional edge: If needs reply
+# Conditional edge: If needs reply; otherwise move on to the next email, if any
 def should_reply(state: AgentState) -> str:
-    return "generate_reply" if state['needs_reply'] else "end"
+    if state['needs_reply']:
+        return "generate_reply"
+    return "assess_reply" if state['emails'] else "flush_outbox"
 
 # Node: Generate reply
 def generate_reply(state: AgentState) -> AgentState:
-    email = state['current_email']
-    prompt = SystemMessage(content="""You are a helpful assistant. Draft a professional, concise reply.
-    Use business casual tone. Start with 'Hello,' end with 'Best regards,'.
-    Output plain text.""")
-    user_msg = HumanMessage(content=f"Subject: {email['subject']}\nBody: {email['body']}")
-    response = llm.invoke([prompt, user_msg])
-    state['reply_draft'] = response.content
+    state['reply_draft'] = draft_reply(state['current_email'])
     return state
 
-# Node: Send reply
+# Node: Send reply (queued; flush_outbox sends the cycle's replies together)
 def send_reply(state: AgentState) -> AgentState:
+    item = outbox_item(state['current_email'], state['reply_draft'])
+    state['outbox'] = state.get('outbox', []) + [item]
+    return state
+
+# Conditional edge (parallel mode): one process_email branch per fetched email
+def dispatch_emails(state: ParallelAgentState):
+    if not state['emails']:
+        return "flush_outbox"
+    return [Send("process_email", {"email": email}) for email in state['emails']]
+
+# Node (parallel mode): assess, draft and queue the reply for a single email.
+# A failure is recorded for that email without failing its siblings; after
+# EMAIL_MAX_ATTEMPTS failures, or a fatal LLM error, the email is given up on.
+def process_email(task: EmailTask) -> dict:
+    email = task['email']
+    try:
+        if not email_needs_reply(email):
+            return {'results': [{'id': email['id'], 'needs_reply': False}]}
+        item = outbox_item(email, draft_reply(email))
+    except Exception as e:
+        fatal = isinstance(e, LLMError) and e.kind == FATAL
+        gave_up = ledger.record_failure(email['id'], EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_DELAY, fatal=fatal)
+        print(f"Failed to process email {email['id']}{' (giving up)' if gave_up else ''}: {e}")
+        return {'results': [{'id': email['id'], 'error': str(e), 'gave_up': gave_up}]}
+    return {'results': [{'id': email['id'], 'needs_reply': True}], 'outbox': [item]}
+
+# Replies drafted in an earlier cycle whose send failed, rebuilt from the ledger's
+# draft and the email's headers. Mail that was read or deleted in the meantime
+# has been handled elsewhere, so it is retired rather than fetched every cycle.
+def retry_outbox_items(service, pending):
+    messages, failed = gmail_batch.get_messages(service, list(pending))
+    items, retired = [], []
+    for msg_data in messages:
+        if 'UNREAD' in msg_data.get('labelIds', ['UNREAD']):
+            items.append(outbox_item(email_from_message(msg_data), pending[msg_data['id']]))
+        else:
+            retired.append(msg_data['id'])
+    retired += [message_id for message_id, error in failed.items()
+                if isinstance(error, HttpError) and error.resp.status == 404]
+    if retired:
+        ledger.record(retired, READ)
+    return items
+
+# Node: Send queued replies in batches, then mark the replied-to emails read in one call.
+# Each step is recorded in the ledger as soon as Gmail confirms it; a crash during
+# the send batch itself can still repeat that batch's replies on the next cycle.
+# Replies that failed to send stay DRAFTED in the ledger and are retried here.
+def flush_outbox(state: AgentState) -> AgentState:
+    outbox = []
+    for item in state.get('outbox', []):
+        if ledger.reached(item['email_id'], SENT):
+            ledger.note('sends_skipped')
+        else:
+            outbox.append(item)
+    queued = {item['email_id'] for item in outbox}
+    pending_send = {message_id: draft for message_id, draft in ledger.pending_send().items()
+                    if message_id not in queued}
+    pending_read = ledger.pending_mark_read()
+    state['sent'] = False
+    if not outbox and not pending_send and not pending_read:
+        return state
     service = get_gmail_service()
-    email = state['current_email']
-    message = MIMEText(state['reply_draft'])
-    message['to'] = email['from']
-    message['subject'] = f"Re: {email['subject']}"
-    raw = base64.urlsafe_b64encode(message.as_bytes()).decode()
-    body = {'raw': raw, 'threadId': email['threadId']}
     try:
-        service.users().messages().send(userId='me', body=body).execute()
-        state['sent'] = True
-        # Mark as read
-        service.users().messages().modify(userId='me', id=email['id'], body={'removeLabelIds': ['UNREAD']}).execute()
+        sent_ids = []
+        if pending_send:
+            outbox += retry_outbox_items(service, pending_send)
+        if outbox:
+            started = time.perf_counter()
+            sent, failed = gmail_batch.send_messages(service, [item['body'] for item in outbox])
+            if failed:
+                print(f"Failed to send replies to {', '.join(outbox[i]['email_id'] for i in failed)}")
+            sent_ids = [outbox[i]['email_id'] for i in sent]
+            if sent_ids:
+                ledger.record(sent_ids, SENT, duration=(time.perf_counter() - started) / len(sent_ids))
+            state['sent'] = len(sent) == len(outbox)
+        to_mark = list(dict.fromkeys(sent_ids + pending_read))
+        if to_mark:
+            started = time.perf_counter()
+            gmail_batch.mark_read(service, to_mark)
+            ledger.record(to_mark, READ, duration=(time.perf_counter() - started) / len(to_mark))
     except HttpError as error:
         print(f'An error occurred: {error}')
-        state['sent'] = False
+    state['outbox'] = []
     return state
 
-# Build the graph
+# Build the sequential graph
 workflow = StateGraph(state_schema=AgentState)
 
 workflow.add_node("fetch_emails", fetch_emails)
 workflow.add_node("assess_reply", assess_reply)
 workflow.add_node("generate_reply", generate_reply)
 workflow.add_node("send_reply", send_reply)
+workflow.add_node("flush_outbox", flush_outbox)
 
 workflow.add_edge("fetch_emails", "assess_reply")
-workflow.add_conditional_edges("assess_reply", should_reply, {"generate_reply": "generate_reply", "end": END})
+workflow.add_conditional_edges("assess_reply", should_reply, {"generate_reply": "generate_reply", "assess_reply": "assess_reply", "flush_outbox": "flush_outbox"})
 workflow.add_edge("generate_reply", "send_reply")
 workflow.add_edge("send_reply", "assess_reply")  # Loop back if more emails
+workflow.add_edge("flush_outbox", END)
 
 workflow.set_entry_point("fetch_emails")
 
-app = workflow.compile()
+sequential_app = workflow.compile()
+
+# Build the parallel graph: fetch -> N x process_email -> flush
+parallel_workflow = StateGraph(state_schema=ParallelAgentState)
+
+parallel_workflow.add_node("fetch_emails", fetch_emails)
+parallel_workflow.add_node("process_email", process_email)
+parallel_workflow.add_node("flush_outbox", flush_outbox)
+
+parallel_workflow.add_conditional_edges("fetch_emails", dispatch_emails, ["process_email", "flush_outbox"])
+parallel_workflow.add_edge("process_email", "flush_outbox")
+parallel_workflow.add_edge("flush_outbox", END)
+
+parallel_workflow.set_entry_point("fetch_emails")
+
+parallel_app = parallel_workflow.compile()
+
+app = parallel_app if EMAIL_MODE == 'parallel' else sequential_app
+
+# Run the agent in a loop. The checkpoint advances only after a cycle completes,
+# and the poll interval adapts to traffic (poller.trigger.fire() polls right away,
+# e.g. from a Gmail push notification handler).
+poller = AdaptivePoller(min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL)
+
+def run_cycle(graph=None, concurrency=EMAIL_CONCURRENCY):
+    # max_concurrency caps how many process_email branches run at once; the
+    # sequential graph takes a few steps per email, hence the high recursion limit
+    config = {"max_concurrency": concurrency, "recursion_limit": 10000}
+    result = (graph or app).invoke({"emails": [], "outbox": [], "sent": False}, config=config)
+    # A parallel branch that failed only marks its email with 'error'; keep the
+    # checkpoint so a later cycle fetches it again (the ledger skips finished work
+    # and holds the email back until its retry is due). Given-up emails don't count.
+    failed = [r['id'] for r in result.get('results', []) if 'error' in r and not r.get('gave_up')]
+    failed += result.get('deferred', [])
+    if failed:
+        print(f"Not advancing the sync checkpoint; {len(failed)} email(s) failed or awaiting retry: {', '.join(failed)}")
+    else:
+        gmail_sync.commit(result.get('history_id'))
+    return result
 
-# Run the agent in a loop (poll every 60 seconds)
-while True:
-    app.invoke({"emails": [], "sent": False})
-    time.sleep(60)
+if __name__ == "__main__":
+    while True:
+        found = False
+        try:
+            found = run_cycle().get('fetched', 0) > 0
+        except (HttpError, LLMError) as error:
+            # The checkpoint only advances after a full cycle, so the next poll retries
+            print(f'An error occurred: {error}')
+        poller.record(found)
+        poller.wait()
@@ -0,0 +1,82 @@
+import argparse
+import base64
+import random
+
+import gmail_batch
+from fake_gmail import FakeGmailService
+
+# Compares Gmail round trips and response bytes for one agent cycle: the old
+# path (a full-format messages.get per email, then send + modify per reply)
+# against batched, field-masked fetches, batched sends and one batchModify.
+# Runs against fake_gmail, so no credentials or network are needed.
+#
+#   python bench_gmail_fetch.py --messages 200 --reply-rate 0.3
+
+def encode(text):
+    return {'data': base64.urlsafe_b64encode(text.encode()).decode(), 'size': len(text)}
+
+# Shaped like a real Gmail "full" payload: transport headers plus a
+# multipart/alternative body with text and HTML versions
+def realistic_payload(i):
+    text = f"Hi,\n\nCould you send the figures for project {i} before Friday?\n\nThanks,\nSam\n" * 3
+    html = f"<html><body><div style='font-family:Arial'>{text.replace(chr(10), '<br>')}</div></body></html>"
+    headers = [
+        {'name': 'Delivered-To', 'value': 'me@example.com'},
+        *({'name': 'Received', 'value': f'from mx{n}.example.net by mx.google.com with ESMTPS id {i}{n}; Tue, 1 Oct 2024 09:00:00 -0700'} for n in range(3)),
+        {'name': 'ARC-Seal', 'value': 'i=1; a=rsa-sha256; t=1727798400; cv=none; d=google.com; s=arc-20160816; b=' + 'x' * 340},
+        {'name': 'DKIM-Signature', 'value': 'v=1; a=rsa-sha256; c=relaxed/relaxed; d=example.org; s=s1; b=' + 'y' * 340},
+        {'name': 'From', 'value': f'Sam {i} <sam{i}@example.org>'},
+        {'name': 'To', 'value': 'me@example.com'},
+        {'name': 'Subject', 'value': f'Figures for project {i}'},
+        {'name': 'Date', 'value': 'Tue, 1 Oct 2024 09:00:00 -0700'},
+        {'name': 'Message-ID', 'value': f'<{i}@example.org>'},
+        {'name': 'MIME-Version', 'value': '1.0'},
+        {'name': 'Content-Type', 'value': 'multipart/alternative; boundary="b1"'},
+    ]
+    return {
+        'partId': '', 'mimeType': 'multipart/alternative', 'filename': '', 'headers': headers,
+        'body': {'size': 0},
+        'parts': [
+            {'partId': '0', 'mimeType': 'text/plain', 'filename': '',
+             'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'}], 'body': encode(text)},
+            {'partId': '1', 'mimeType': 'text/html', 'filename': '',
+             'headers': [{'name': 'Content-Type', 'value': 'text/html; charset="UTF-8"'}], 'body': encode(html)},
+        ],
+    }
+
+def reply_body(message_id):
+    raw = base64.urlsafe_b64encode(b'To: sam@example.org\r\nSubject: Re\r\n\r\nHello,\r\nOn it.\r\nBest regards,').decode()
+    return {'raw': raw, 'threadId': f't{message_id[1:]}'}
+
+def per_message_cycle(service, ids, reply_ids):
+    for message_id in ids:
+        service.users().messages().get(userId='me', id=message_id, format='full').execute()
+    for message_id in reply_ids:
+        service.users().messages().send(userId='me', body=reply_body(message_id)).execute()
+        service.users().messages().modify(userId='me', id=message_id, body={'removeLabelIds': ['UNREAD']}).execute()
+
+def batched_cycle(service, ids, reply_ids):
+    gmail_batch.get_messages(service, ids)
+    sent, _ = gmail_batch.send_messages(service, [reply_body(message_id) for message_id in reply_ids])
+    gmail_batch.mark_read(service, [reply_ids[i] for i in sent])
+
+def measure(cycle, messages, reply_rate):
+    service = FakeGmailService(history_retention=messages)
+    ids = [service.add_message('', '', '', payload=realistic_payload(i)) for i in range(messages)]
+    reply_ids = [message_id for message_id in ids if random.random() < reply_rate]
+    service.reset_counters()
+    cycle(service, ids, reply_ids)
+    return service.round_trips, service.bytes_received, len(reply_ids)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--reply-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name, cycle in (("per-message", per_message_cycle), ("batched", batched_cycle)):
+        random.seed(args.seed)
+        round_trips, received, replies = measure(cycle, args.messages, args.reply_rate)
+        print(f"{name:12} {args.messages} fetched, {replies} replied: {round_trips:4d} round trips, "
+              f"{received / 1024:8.1f} KiB received ({received / args.messages:.0f} B/message)")
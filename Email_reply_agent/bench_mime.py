@@ -0,0 +1,83 @@
+import argparse
+import base64
+import glob
+import os
+import time
+
+import mime_text
+from fake_gmail import FakeGmailService
+
+# Prompt size and modelled LLM latency per email over the fixtures/mime corpus
+# for three body extractors:
+#   top-level  - the original fetch_emails: payload['body'] only (empty for multipart)
+#   full text  - first text/plain part, else the raw HTML, sent whole
+#   compacted  - mime_text.email_text: quotes and signatures stripped, token budget
+# Latency is modelled as a fixed per-call cost plus a per-input-token prefill
+# cost, for the assess and draft calls together.
+#
+#   python bench_mime.py --budget 400
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'mime')
+ASSESS_PROMPT = "Determine if this email needs a reply. Output JSON: {'needs_reply': true/false}"
+DRAFT_PROMPT = ("You are a helpful assistant. Draft a professional, concise reply.\n    Use business casual tone. "
+                "Start with 'Hello,' end with 'Best regards,'.\n    Output plain text.")
+
+def top_level_body(payload):
+    data = payload.get('body', {}).get('data')
+    return base64.urlsafe_b64decode(data).decode('utf-8', errors='replace') if data else ''
+
+def full_text_body(payload):
+    html = None
+    for mime_type, part in mime_text.iter_text_parts(payload):
+        if mime_type == 'text/plain':
+            return mime_text.decode_part(part)
+        html = html or mime_text.decode_part(part)
+    return html or ''
+
+def prompt_tokens(subject, body):
+    user = f"Subject: {subject}\nBody: {body}"
+    return sum(mime_text.estimate_tokens(system + user) for system in (ASSESS_PROMPT, DRAFT_PROMPT))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=800, help="EMAIL_TOKEN_BUDGET for the compacted extractor")
+    parser.add_argument("--call-ms", type=float, default=350.0, help="fixed latency per LLM call")
+    parser.add_argument("--ms-per-token", type=float, default=0.25, help="prefill latency per input token")
+    args = parser.parse_args()
+
+    service = FakeGmailService()
+    messages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.eml'))):
+        with open(path, 'rb') as f:
+            message_id = service.add_raw_message(f.read())
+        messages.append((os.path.basename(path), service.messages[message_id]['payload']))
+
+    extractors = [
+        ("top-level", top_level_body),
+        ("full text", full_text_body),
+        ("compacted", lambda payload: mime_text.email_text(payload, args.budget)),
+    ]
+    print(f"{'fixture':28}" + "".join(f"{name:>12}" for name, _ in extractors) + "   (prompt tokens, assess + draft)")
+    totals = {name: 0 for name, _ in extractors}
+    empty = {name: 0 for name, _ in extractors}
+    elapsed = {name: 0.0 for name, _ in extractors}
+    for filename, payload in messages:
+        subject = next((h['value'] for h in payload['headers'] if h['name'] == 'Subject'), '')
+        row = f"{filename:28}"
+        for name, extract in extractors:
+            started = time.perf_counter()
+            body = extract(payload)
+            elapsed[name] += time.perf_counter() - started
+            tokens = prompt_tokens(subject, body)
+            totals[name] += tokens
+            empty[name] += not body.strip()
+            row += f"{tokens:12d}"
+        print(row)
+
+    count = len(messages)
+    print()
+    for name, _ in extractors:
+        tokens = totals[name] / count
+        latency = 2 * args.call_ms + tokens * args.ms_per_token
+        print(f"{name:10} {tokens:7.0f} tokens/email  ~{latency:5.0f} ms LLM/email  "
+              f"{empty[name]} empty bodies  {1000 * elapsed[name] / count:.2f} ms extraction/email")
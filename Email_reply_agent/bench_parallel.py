@@ -0,0 +1,74 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+# Cycle throughput (emails/minute) of the sequential graph against the parallel
+# graph at several concurrency caps. The LLM is a stub with fixed latency and a
+# requests-per-minute ceiling, so throughput should climb with the cap until
+# the ceiling is hit. Gmail is fake_gmail, so no credentials are needed.
+#
+#   python bench_parallel.py --emails 40 --latency 0.5 --rpm 600
+
+os.environ.setdefault('GOOGLE_API_KEY', 'bench')
+os.chdir(tempfile.mkdtemp())  # Keep the sync checkpoint out of the repo
+
+import Agent
+from fake_gmail import FakeGmailService
+from ledger import Ledger
+
+class StubResponse:
+    def __init__(self, content):
+        self.content = content
+
+# Blocking stub: every call takes `latency` seconds and calls are spaced so no
+# more than `rpm` start per minute
+class StubLLM:
+    def __init__(self, latency, rpm):
+        self.latency = latency
+        self.interval = 60.0 / rpm
+        self.next_start = 0.0
+        self.lock = threading.Lock()
+
+    def invoke(self, messages):
+        with self.lock:
+            start = max(time.monotonic(), self.next_start)
+            self.next_start = start + self.interval
+        time.sleep(max(0.0, start - time.monotonic()) + self.latency)
+        if 'Determine' in messages[0].content:
+            return StubResponse('{"needs_reply": %s}' % ('true' if '?' in messages[1].content else 'false'))
+        return StubResponse('Hello,\nThanks, will do.\nBest regards,')
+
+def run(graph, concurrency, emails):
+    service = FakeGmailService(history_retention=emails)
+    for i in range(emails):
+        service.add_message(f'Subject {i}', f'sender{i}@example.org',
+                            'Can you confirm?' if i % 2 == 0 else 'FYI, no action needed.')
+    Agent.set_gmail_service(service)
+    Agent.ledger = Ledger(':memory:')  # Fresh ledger so no run reuses another's LLM outputs
+    if os.path.exists(Agent.SYNC_STATE_FILE):
+        os.remove(Agent.SYNC_STATE_FILE)
+    started = time.monotonic()
+    result = Agent.run_cycle(graph, concurrency)
+    elapsed = time.monotonic() - started
+    assert result['fetched'] == emails and len(service.sent) == (emails + 1) // 2
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--emails", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--rpm", type=float, default=600)
+    parser.add_argument("--caps", default="1,2,4,8,16")
+    args = parser.parse_args()
+
+    Agent.llm = StubLLM(args.latency, args.rpm)
+    llm_calls = args.emails + (args.emails + 1) // 2
+    print(f"{args.emails} emails, {llm_calls} LLM calls at {args.latency}s each, LLM limit {args.rpm:.0f} rpm "
+          f"(ceiling {60 * args.emails / (llm_calls * 60 / args.rpm):.0f} emails/min)")
+    runs = [("sequential", Agent.sequential_app, 1)]
+    runs += [(f"parallel x{cap}", Agent.parallel_app, cap) for cap in map(int, args.caps.split(","))]
+    for name, graph, cap in runs:
+        elapsed = run(graph, cap, args.emails)
+        print(f"{name:12} {elapsed:6.2f}s  {60 * args.emails / elapsed:7.1f} emails/min")
@@ -0,0 +1,274 @@
+# In-memory stand-in for the parts of the Gmail API the agent uses
+# (users.getProfile, messages.list/get/send/modify/batchModify, history.list and
+# batch requests), for running the agent and its sync logic offline. Every
+# execute() counts as one round trip, a batch included, and `fields` masks are
+# applied to responses so bytes_received tracks what Gmail would send back.
+#
+#   import Agent, fake_gmail
+#   Agent.set_gmail_service(fake_gmail.FakeGmailService())
+
+import base64
+import email
+import email.policy
+import itertools
+import json
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Partial-response masks: "a,b/c,d(e,f)" -> {'a': None, 'b': {'c': None}, 'd': {...}}
+def parse_fields(fields):
+    def parse(pos):
+        tree = {}
+        name = ''
+        path = []
+        while pos < len(fields):
+            char = fields[pos]
+            if char == '/':
+                path.append(name)
+                name = ''
+            elif char == '(':
+                subtree, pos = parse(pos + 1)
+                _insert(tree, path + [name], subtree)
+                path, name = [], ''
+            elif char == ')':
+                break
+            elif char == ',':
+                if name:
+                    _insert(tree, path + [name], None)
+                path, name = [], ''
+            else:
+                name += char.strip()
+            pos += 1
+        if name:
+            _insert(tree, path + [name], None)
+        return tree, pos
+
+    return parse(0)[0]
+
+def _insert(tree, path, subtree):
+    for key in path[:-1]:
+        if key in tree and tree[key] is None:
+            return  # Parent is already selected whole
+        tree = tree.setdefault(key, {})
+    tree[path[-1]] = subtree
+
+def apply_fields(value, mask):
+    if mask is None:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(item, mask) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: apply_fields(value[key], sub) for key, sub in mask.items() if key in value}
+
+class FakeRequest:
+    def __init__(self, service, handler, fields=None):
+        self.service = service
+        self.handler = handler
+        self.fields = fields
+
+    def _run(self):
+        response = self.handler()
+        if self.fields:
+            response = apply_fields(response, parse_fields(self.fields))
+        self.service.bytes_received += len(json.dumps(response))
+        return response
+
+    def execute(self):
+        self.service.round_trips += 1
+        return self._run()
+
+# Mirrors googleapiclient's BatchHttpRequest: one round trip for all added requests
+class FakeBatch:
+    def __init__(self, service, callback=None):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        if len(self.requests) >= 1000:
+            raise ValueError('Exceeded the maximum calls in a single batch')
+        request_id = request_id if request_id is not None else str(len(self.requests))
+        self.requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        self.service.round_trips += 1
+        self.service.batch_sizes.append(len(self.requests))
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = request._run(), None
+            except HttpError as error:
+                response, exception = None, error
+            if callback is not None:
+                callback(request_id, response, exception)
+
+class _Resource:
+    def __init__(self, service, methods):
+        self.service = service
+        for name, handler in methods.items():
+            setattr(self, name, self._bind(handler))
+
+    def _bind(self, handler):
+        def build(fields=None, **kwargs):
+            return FakeRequest(self.service, lambda: handler(**kwargs), fields)
+        return build
+
+# Gmail API "full" payload for an email.message.Message, parts and all.
+# Attachments get an attachmentId instead of inline data, as Gmail does.
+def payload_from_mime(message, part_id=''):
+    payload = {
+        'partId': part_id,
+        'mimeType': message.get_content_type(),
+        'filename': message.get_filename() or '',
+        'headers': [{'name': name, 'value': str(value)} for name, value in message.items()],
+    }
+    if message.is_multipart():
+        payload['body'] = {'size': 0}
+        payload['parts'] = [payload_from_mime(part, f"{part_id}.{i}".lstrip('.'))
+                            for i, part in enumerate(message.get_payload())]
+        return payload
+    data = message.get_payload(decode=True) or b''
+    if payload['filename']:
+        payload['body'] = {'attachmentId': f"att-{part_id}", 'size': len(data)}
+    else:
+        # Gmail hands back text parts decoded to UTF-8
+        if message.get_content_maintype() == 'text':
+            data = data.decode(message.get_content_charset() or 'utf-8', errors='replace').encode()
+        payload['body'] = {'size': len(data), 'data': base64.urlsafe_b64encode(data).decode()}
+    return payload
+
+class FakeGmailService:
+    def __init__(self, history_retention=1000):
+        self.messages = {}
+        self.history = []  # (history id, message id) for every added message
+        self.history_ids = itertools.count(1000)
+        self.history_id = next(self.history_ids)
+        self.history_retention = history_retention
+        self.message_ids = itertools.count(1)
+        self.sent = []
+        self.round_trips = 0
+        self.bytes_received = 0
+        self.batch_sizes = []
+
+    # Test helpers
+    def add_message(self, subject, sender, body, labels=('INBOX', 'UNREAD'), payload=None):
+        message_id = f"m{next(self.message_ids):06d}"
+        self.history_id = next(self.history_ids)
+        self.messages[message_id] = {
+            'id': message_id,
+            'threadId': f"t{message_id[1:]}",
+            'labelIds': list(labels),
+            'historyId': str(self.history_id),
+            'snippet': body[:200],
+            'sizeEstimate': len(body) + 1024,
+            'internalDate': str(1700000000000 + self.history_id),
+            'payload': payload or {
+                'mimeType': 'text/plain',
+                'headers': [{'name': 'Subject', 'value': subject}, {'name': 'From', 'value': sender}],
+                'body': {'data': base64.urlsafe_b64encode(body.encode()).decode(), 'size': len(body)},
+            },
+        }
+        self.history.append((self.history_id, message_id))
+        self.history = self.history[-self.history_retention:]
+        return message_id
+
+    # Add an RFC 822 message (e.g. the contents of a .eml file)
+    def add_raw_message(self, raw, labels=('INBOX', 'UNREAD')):
+        message = email.message_from_bytes(raw, policy=email.policy.compat32)
+        return self.add_message(message.get('Subject', ''), message.get('From', ''), '', labels,
+                                payload=payload_from_mime(message))
+
+    def reset_counters(self):
+        self.round_trips = 0
+        self.bytes_received = 0
+        self.batch_sizes = []
+
+    # API surface
+    def users(self):
+        return _Users(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def _not_found(self, reason='Not Found'):
+        return HttpError(httplib2.Response({'status': 404, 'reason': reason}), b'{}')
+
+    def _get_profile(self, userId):
+        return {'emailAddress': 'me@example.com', 'historyId': str(self.history_id)}
+
+    def _matches(self, message, labelIds=None, q=None):
+        labels = message['labelIds']
+        if labelIds and not all(label in labels for label in labelIds):
+            return False
+        if q and 'is:unread' in q and 'UNREAD' not in labels:
+            return False
+        if q and '-from:me' in q and 'SENT' in labels:
+            return False
+        return True
+
+    def _list(self, userId, labelIds=None, q=None, maxResults=100, pageToken=None):
+        matching = [m for m in self.messages.values() if self._matches(m, labelIds, q)]
+        start = int(pageToken or 0)
+        page = matching[start:start + maxResults]
+        response = {'messages': [{'id': m['id'], 'threadId': m['threadId']} for m in page],
+                    'resultSizeEstimate': len(matching)}
+        if start + maxResults < len(matching):
+            response['nextPageToken'] = str(start + maxResults)
+        return response
+
+    def _get(self, userId, id, format='full'):
+        if id not in self.messages:
+            raise self._not_found()
+        return json.loads(json.dumps(self.messages[id]))
+
+    def _send(self, userId, body):
+        self.sent.append(body)
+        return {'id': f"s{len(self.sent)}", 'threadId': body.get('threadId'), 'labelIds': ['SENT']}
+
+    def _modify(self, userId, id, body):
+        message = self.messages[id]
+        message['labelIds'] = [l for l in message['labelIds'] if l not in body.get('removeLabelIds', [])]
+        message['labelIds'] += [l for l in body.get('addLabelIds', []) if l not in message['labelIds']]
+        return {'id': id, 'labelIds': message['labelIds']}
+
+    def _batch_modify(self, userId, body):
+        if len(body['ids']) > 1000:
+            raise HttpError(httplib2.Response({'status': 400, 'reason': 'Too many ids'}), b'{}')
+        for message_id in body['ids']:
+            if message_id in self.messages:
+                self._modify(userId, message_id, body)
+        return {}
+
+    def _history_list(self, userId, startHistoryId, historyTypes=None, labelId=None, maxResults=100, pageToken=None):
+        start = int(startHistoryId)
+        if self.history and start < self.history[0][0] - 1:
+            raise self._not_found('History expired')
+        records = []
+        for history_id, message_id in self.history:
+            message = self.messages[message_id]
+            if history_id > start and (labelId is None or labelId in message['labelIds']):
+                records.append({'id': str(history_id), 'messagesAdded': [{'message': {
+                    'id': message_id, 'threadId': message['threadId'], 'labelIds': list(message['labelIds'])}}]})
+        offset = int(pageToken or 0)
+        response = {'history': records[offset:offset + maxResults], 'historyId': str(self.history_id)}
+        if offset + maxResults < len(records):
+            response['nextPageToken'] = str(offset + maxResults)
+        return response
+
+class _Users:
+    def __init__(self, service):
+        self.service = service
+
+    def getProfile(self, **kwargs):
+        return FakeRequest(self.service, lambda: self.service._get_profile(**kwargs))
+
+    def messages(self):
+        return _Resource(self.service, {
+            'list': self.service._list, 'get': self.service._get,
+            'send': self.service._send, 'modify': self.service._modify,
+            'batchModify': self.service._batch_modify,
+        })
+
+    def history(self):
+        return _Resource(self.service, {'list': self.service._history_list})
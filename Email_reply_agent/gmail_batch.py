@@ -0,0 +1,73 @@
+# Bulk Gmail calls. Message fetches and sends go through the batch HTTP
+# endpoint (up to BATCH_SIZE sub-requests per round trip), fetches carry a
+# `fields` mask so only what the agent reads comes back, and marking mail as
+# read is a single messages.batchModify call for up to 1000 ids.
+
+# Gmail accepts up to 100 calls per batch but recommends 50 to stay clear of
+# per-user rate limits
+BATCH_SIZE = 50
+MODIFY_BATCH_SIZE = 1000
+
+# Everything fetch_emails reads: ids, labels, top-level headers and inline body
+# data, three levels of MIME parts deep (multipart/mixed > multipart/related >
+# multipart/alternative > text/plain); filenames let attachments be skipped
+_PART_FIELDS = 'mimeType,filename,body/data'
+MESSAGE_FIELDS = (
+    f'id,threadId,labelIds,payload({_PART_FIELDS},headers(name,value),'
+    f'parts({_PART_FIELDS},parts({_PART_FIELDS},parts({_PART_FIELDS}))))'
+)
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# Runs build_request(item) for every item through batch requests. Returns
+# ({index: response}, {index: error}); failures are logged by describe(item)
+# only, since an item can be a whole raw message
+def _execute_batched(service, items, build_request, action, describe=str):
+    responses = {}
+    failed = {}
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        if exception is not None:
+            print(f'Failed to {action} {describe(items[index])}: {exception}')
+            failed[index] = exception
+        else:
+            responses[index] = response
+
+    for offset, chunk in zip(range(0, len(items), BATCH_SIZE), _chunks(items, BATCH_SIZE)):
+        batch = service.new_batch_http_request(callback=callback)
+        for i, item in enumerate(chunk):
+            batch.add(build_request(item), request_id=str(offset + i))
+        batch.execute()
+    return responses, failed
+
+# Fetch messages by id, keeping input order. Returns (messages, {id: error})
+# so the caller can tell a deleted message (404) from a transient failure.
+def get_messages(service, message_ids, fields=MESSAGE_FIELDS):
+    message_ids = list(message_ids)
+    responses, failed = _execute_batched(
+        service, message_ids,
+        lambda message_id: service.users().messages().get(
+            userId='me', id=message_id, format='full', fields=fields),
+        'fetch message',
+    )
+    return [responses[i] for i in sorted(responses)], {message_ids[i]: error for i, error in failed.items()}
+
+# Send raw messages ({'raw': ..., 'threadId': ...}). Returns (indexes sent,
+# indexes that failed) so unsent replies can be retried.
+def send_messages(service, bodies):
+    responses, failed = _execute_batched(
+        service, list(bodies),
+        lambda body: service.users().messages().send(userId='me', body=body, fields='id'),
+        'send message',
+        describe=lambda body: f"reply in thread {body.get('threadId')}",
+    )
+    return sorted(responses), sorted(failed)
+
+def mark_read(service, message_ids):
+    message_ids = list(message_ids)
+    for chunk in _chunks(message_ids, MODIFY_BATCH_SIZE):
+        service.users().messages().batchModify(
+            userId='me', body={'ids': chunk, 'removeLabelIds': ['UNREAD']}).execute()
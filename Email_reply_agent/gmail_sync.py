@@ -0,0 +1,126 @@
+# Incremental Gmail sync built on history checkpoints.
+# The first cycle (or one whose checkpoint has expired) pages through every
+# unread inbox message and records the mailbox historyId. Later cycles ask
+# users.history.list for messages added since that checkpoint, so each poll
+# costs one small request when nothing has changed. The checkpoint is saved
+# only after a cycle has been processed, so a crash re-reads the same changes.
+
+import json
+import os
+import threading
+
+from googleapiclient.errors import HttpError
+
+UNREAD_QUERY = 'is:unread -from:me'
+
+class SyncCheckpoint:
+    def __init__(self, path='gmail_sync_state.json'):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f).get('historyId')
+
+    def save(self, history_id):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'historyId': str(history_id)}, f)
+        os.replace(tmp_path, self.path)
+
+class GmailSync:
+    def __init__(self, checkpoint, label_id='INBOX', query=UNREAD_QUERY, page_size=100):
+        self.checkpoint = checkpoint
+        self.label_id = label_id
+        self.query = query
+        self.page_size = page_size
+
+    # Returns (message ids to process, historyId to commit once they're done)
+    def changed_message_ids(self, service):
+        start_history_id = self.checkpoint.load()
+        if start_history_id is not None:
+            try:
+                return self._history_changes(service, start_history_id)
+            except HttpError as error:
+                # 404 means the checkpoint is older than Gmail keeps history for
+                if error.resp.status != 404:
+                    raise
+                print('Gmail history checkpoint expired; doing a full sync')
+        return self._full_sync(service)
+
+    def _full_sync(self, service):
+        # Take the historyId first so anything arriving mid-listing shows up next cycle
+        history_id = service.users().getProfile(userId='me').execute()['historyId']
+        ids = []
+        page_token = None
+        while True:
+            response = service.users().messages().list(
+                userId='me', labelIds=[self.label_id], q=self.query,
+                maxResults=self.page_size, pageToken=page_token,
+            ).execute()
+            ids.extend(msg['id'] for msg in response.get('messages', []))
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return ids, history_id
+
+    def _history_changes(self, service, start_history_id):
+        ids = []
+        seen = set()
+        page_token = None
+        while True:
+            response = service.users().history().list(
+                userId='me', startHistoryId=start_history_id, historyTypes=['messageAdded'],
+                labelId=self.label_id, maxResults=self.page_size, pageToken=page_token,
+            ).execute()
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added['message']
+                    labels = message.get('labelIds', [])
+                    # Same filter as UNREAD_QUERY: unread and not sent by us
+                    if message['id'] in seen or 'UNREAD' not in labels or 'SENT' in labels:
+                        continue
+                    seen.add(message['id'])
+                    ids.append(message['id'])
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return ids, response.get('historyId', start_history_id)
+
+    def commit(self, history_id):
+        if history_id is not None:
+            self.checkpoint.save(history_id)
+
+# Trigger that ends a poll wait early. Push integrations (e.g. a Gmail watch()
+# Pub/Sub subscriber) call fire() when a notification arrives.
+class PollTrigger:
+    def __init__(self):
+        self.event = threading.Event()
+
+    def fire(self):
+        self.event.set()
+
+    # Returns True if woken by fire(), False on timeout
+    def wait(self, timeout):
+        fired = self.event.wait(timeout)
+        self.event.clear()
+        return fired
+
+# Poll interval that drops to the minimum while mail is arriving and backs off
+# geometrically while the inbox is quiet.
+class AdaptivePoller:
+    def __init__(self, min_interval=10.0, max_interval=300.0, backoff=2.0, trigger=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.trigger = trigger or PollTrigger()
+
+    def record(self, found):
+        if found:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+        return self.interval
+
+    def wait(self):
+        return self.trigger.wait(self.interval)
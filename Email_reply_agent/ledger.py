@@ -0,0 +1,170 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+
+# Durable per-message progress for the email agent. Each Gmail message id moves
+# forward through the stages below, and the LLM outputs (the needs_reply verdict
+# and the draft) are stored alongside, so a cycle that crashed part way is
+# resumed on the next poll without paying for the same LLM calls again or
+# re-sending a reply. Every stage transition is also logged with its duration
+# for latency statistics. Failed attempts are counted per message too, so an
+# email that keeps failing is retried with backoff and eventually given up on:
+#
+#   python ledger.py email_ledger.sqlite3
+
+FETCHED = "fetched"
+ASSESSED = "assessed"
+DRAFTED = "drafted"
+SENT = "sent"
+READ = "read"
+STAGES = [FETCHED, ASSESSED, DRAFTED, SENT, READ]
+
+class Ledger:
+    def __init__(self, path="email_ledger.sqlite3", retention=30 * 24 * 3600):
+        self.path = path
+        self.lock = threading.Lock()
+        self.counts = {"assess_reused": 0, "draft_reused": 0, "sends_skipped": 0, "retries_deferred": 0}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages (id TEXT PRIMARY KEY, stage TEXT NOT NULL, "
+            "needs_reply INTEGER, draft TEXT, updated_at REAL NOT NULL, "
+            "failures INTEGER NOT NULL DEFAULT 0, retry_at REAL, gave_up INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Ledgers written before failure tracking lack these columns
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(messages)")}
+        for column, definition in (("failures", "INTEGER NOT NULL DEFAULT 0"), ("retry_at", "REAL"),
+                                   ("gave_up", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE messages ADD COLUMN {column} {definition}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS stage_events (message_id TEXT NOT NULL, stage TEXT NOT NULL, "
+            "at REAL NOT NULL, duration REAL)"
+        )
+        cutoff = time.time() - retention
+        self.conn.execute("DELETE FROM messages WHERE updated_at < ?", (cutoff,))
+        self.conn.execute("DELETE FROM stage_events WHERE at < ?", (cutoff,))
+        self.conn.commit()
+
+    def get(self, message_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT stage, needs_reply, draft, failures, retry_at, gave_up FROM messages WHERE id = ?", (message_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": message_id, "stage": row[0],
+                "needs_reply": None if row[1] is None else bool(row[1]), "draft": row[2],
+                "failures": row[3], "retry_at": row[4], "gave_up": bool(row[5])}
+
+    def reached(self, message_id, stage):
+        entry = self.get(message_id)
+        return entry is not None and STAGES.index(entry["stage"]) >= STAGES.index(stage)
+
+    # Move a message to `stage` (never backwards) and store any LLM output given
+    def record(self, message_ids, stage, duration=None, needs_reply=None, draft=None):
+        if isinstance(message_ids, str):
+            message_ids = [message_ids]
+        now = time.time()
+        rank = STAGES.index(stage)
+        with self.lock:
+            for message_id in message_ids:
+                row = self.conn.execute("SELECT stage FROM messages WHERE id = ?", (message_id,)).fetchone()
+                if row is None:
+                    self.conn.execute(
+                        "INSERT INTO messages (id, stage, needs_reply, draft, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (message_id, stage, needs_reply, draft, now),
+                    )
+                else:
+                    new_stage = stage if rank > STAGES.index(row[0]) else row[0]
+                    self.conn.execute(
+                        "UPDATE messages SET stage = ?, needs_reply = COALESCE(?, needs_reply), "
+                        "draft = COALESCE(?, draft), updated_at = ? WHERE id = ?",
+                        (new_stage, needs_reply, draft, now, message_id),
+                    )
+                self.conn.execute(
+                    "INSERT INTO stage_events (message_id, stage, at, duration) VALUES (?, ?, ?, ?)",
+                    (message_id, stage, now, duration),
+                )
+            self.conn.commit()
+
+    # Count a failed attempt at a message. Returns True once it is given up on
+    # (`fatal`, or `max_failures` reached); otherwise it is due again after a
+    # delay that doubles with each failure.
+    def record_failure(self, message_id, max_failures, base_delay, fatal=False):
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT failures FROM messages WHERE id = ?", (message_id,)).fetchone()
+            failures = (row[0] if row else 0) + 1
+            gave_up = fatal or failures >= max_failures
+            retry_at = None if gave_up else now + base_delay * 2 ** (failures - 1)
+            if row is None:
+                self.conn.execute(
+                    "INSERT INTO messages (id, stage, updated_at, failures, retry_at, gave_up) VALUES (?, ?, ?, ?, ?, ?)",
+                    (message_id, FETCHED, now, failures, retry_at, int(gave_up)),
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE messages SET failures = ?, retry_at = ?, gave_up = ?, updated_at = ? WHERE id = ?",
+                    (failures, retry_at, int(gave_up), now, message_id),
+                )
+            self.conn.commit()
+        return gave_up
+
+    # Replies that went out but whose email was never marked read (crash in between)
+    def pending_mark_read(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT id FROM messages WHERE stage = ?", (SENT,))]
+
+    # Replies drafted but never confirmed sent (send failed or crash before it), as {id: draft}
+    def pending_send(self):
+        with self.lock:
+            return dict(self.conn.execute(
+                "SELECT id, draft FROM messages WHERE stage = ? AND needs_reply = 1 AND draft IS NOT NULL", (DRAFTED,)
+            ).fetchall())
+
+    def note(self, counter):
+        with self.lock:
+            self.counts[counter] += 1
+
+    # Per-stage latency in milliseconds, over events that recorded a duration
+    def stage_stats(self, since=0.0):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT stage, duration FROM stage_events WHERE at >= ? AND duration IS NOT NULL ORDER BY duration",
+                (since,),
+            ).fetchall()
+        durations = {}
+        for stage, duration in rows:
+            durations.setdefault(stage, []).append(duration * 1000)
+        stats = {}
+        for stage in STAGES:
+            values = durations.get(stage)
+            if values:
+                stats[stage] = {
+                    "count": len(values),
+                    "avg_ms": round(sum(values) / len(values), 1),
+                    "p50_ms": round(values[len(values) // 2], 1),
+                    "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+                    "max_ms": round(values[-1], 1),
+                }
+        return stats
+
+    def stats(self):
+        with self.lock:
+            by_stage = dict(self.conn.execute("SELECT stage, COUNT(*) FROM messages GROUP BY stage").fetchall())
+            given_up = self.conn.execute("SELECT COUNT(*) FROM messages WHERE gave_up = 1").fetchone()[0]
+            counts = dict(self.counts)
+        return {"messages": by_stage, "given_up": given_up, **counts, "latency": self.stage_stats()}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+if __name__ == "__main__":
+    ledger = Ledger(sys.argv[1] if len(sys.argv) > 1 else "email_ledger.sqlite3")
+    print(json.dumps(ledger.stats(), indent=2))
+    ledger.close()
@@ -0,0 +1,160 @@
+import base64
+import re
+from html.parser import HTMLParser
+
+# Turns a Gmail API message payload into the short plain-text body the LLM
+# prompts need: walk the MIME tree lazily (stopping at the first text/plain
+# part, falling back to stripped HTML), drop quoted history and signatures,
+# then compact the result to a token budget.
+
+CHARS_PER_TOKEN = 4  # Rough average for English text; good enough for budgeting
+
+# Depth-first walk yielding (mimeType, part) for inline text parts only;
+# attachments (a filename or an attachmentId instead of inline data) are skipped
+def iter_text_parts(payload):
+    mime_type = payload.get('mimeType', '')
+    if mime_type.startswith('multipart/'):
+        for part in payload.get('parts', []):
+            yield from iter_text_parts(part)
+    elif mime_type in ('text/plain', 'text/html') and not payload.get('filename') and payload.get('body', {}).get('data'):
+        yield mime_type, payload
+
+def decode_part(part):
+    data = part['body']['data']
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4)).decode('utf-8', errors='replace')
+
+class _HTMLText(HTMLParser):
+    BLOCK_TAGS = {'br', 'p', 'div', 'tr', 'li', 'h1', 'h2', 'h3', 'h4', 'blockquote', 'table'}
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+    VOID_TAGS = {'br', 'img', 'hr', 'meta', 'link', 'input', 'wbr', 'col', 'area', 'base', 'source'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks = []
+        self.skip_depth = 0
+        # Open elements named like the outermost quote element, that one first. Only
+        # its own tag name is tracked, since HTML mail often leaves <p>/<li> unclosed.
+        self.quote_stack = []
+
+    def handle_starttag(self, tag, attrs):
+        classes = dict(attrs).get('class') or ''
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in self.VOID_TAGS:
+            pass
+        elif self.quote_stack:
+            if tag == self.quote_stack[0]:
+                self.quote_stack.append(tag)
+        # Quoted history in Gmail (gmail_quote) and Outlook/Apple (blockquote) replies
+        elif tag == 'blockquote' or 'gmail_quote' in classes:
+            self.quote_stack.append(tag)
+        if tag in self.BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif self.quote_stack and tag == self.quote_stack[-1]:
+            self.quote_stack.pop()
+        if tag in self.BLOCK_TAGS:
+            self.chunks.append('\n')
+
+    def handle_data(self, data):
+        if not self.skip_depth and not self.quote_stack:
+            self.chunks.append(data)
+
+def html_to_text(html):
+    parser = _HTMLText()
+    parser.feed(html)
+    parser.close()
+    return ''.join(parser.chunks)
+
+# Plain text of the message body: the first text/plain part, else the first HTML part stripped
+def body_text(payload):
+    html_part = None
+    for mime_type, part in iter_text_parts(payload):
+        if mime_type == 'text/plain':
+            return decode_part(part)
+        if html_part is None:
+            html_part = part
+    return html_to_text(decode_part(html_part)) if html_part is not None else ''
+
+# Lines that start the quoted original in a reply, from the common clients.
+# Forwarded messages are left alone since the forwarded text is the substance.
+_REPLY_HEADER = re.compile(r'^On .{0,200}wrote:$')  # Gmail, Apple Mail, Thunderbird
+_FORWARD_MARKER = re.compile(r'^-{2,}\s*Forwarded message\s*-{2,}|^Begin forwarded message:', re.IGNORECASE)
+_QUOTE_SEPARATORS = [
+    re.compile(r'^-{2,}\s*Original Message\s*-{2,}', re.IGNORECASE),  # Outlook desktop
+    re.compile(r'^_{20,}$'),  # Outlook web
+]
+_SIGNATURE_STARTS = [
+    re.compile(r'^-- ?$'),  # RFC 3676 signature delimiter
+    re.compile(r'^Sent from my \w+', re.IGNORECASE),
+    re.compile(r'^Get Outlook for \w+', re.IGNORECASE),
+]
+
+def _outlook_header(lines, i):
+    # "From: ..." followed by "Sent:"/"Date:" is Outlook's header for the quoted message
+    return lines[i].startswith('From:') and any(l.startswith(('Sent:', 'Date:')) for l in lines[i + 1:i + 3])
+
+def _reply_header_lines(lines, i):
+    # Number of lines taken by an "On ... wrote:" header at i (it is often wrapped onto two)
+    if _REPLY_HEADER.match(lines[i]):
+        return 1
+    if lines[i].startswith('On ') and i + 1 < len(lines) and _REPLY_HEADER.match(f"{lines[i]} {lines[i + 1]}"):
+        return 2
+    return 0
+
+def strip_quoted_and_signature(text):
+    lines = [line.strip() for line in text.replace('\r\n', '\n').split('\n')]
+    kept = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if _FORWARD_MARKER.match(line):
+            kept.extend(lines[i:])
+            break
+        if line.startswith('>'):
+            i += 1
+            continue
+        header = _reply_header_lines(lines, i)
+        if header:
+            # Skip the header and its "> " block. Text after the block is a
+            # bottom-posted or inline reply and is kept; a top-posted reply
+            # has nothing after it, and unquoted history is dropped outright.
+            end = i + header
+            while end < len(lines) and (not lines[end] or lines[end].startswith('>')):
+                end += 1
+            quoted = any(l.startswith('>') for l in lines[i + header:end])
+            if not quoted or end == len(lines):
+                break
+            i = end
+            continue
+        if any(p.match(line) for p in _QUOTE_SEPARATORS) or _outlook_header(lines, i):
+            break
+        if any(p.match(line) for p in _SIGNATURE_STARTS):
+            break
+        kept.append(line)
+        i += 1
+    return '\n'.join(kept)
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+# Collapse whitespace, then if still over budget keep the opening (context) and
+# the closing (usually the actual ask) and drop the middle
+def compact(text, max_tokens):
+    lines = [' '.join(line.split()) for line in text.split('\n')]
+    text = re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    marker = '\n[...]\n'
+    head_chars = (max_chars - len(marker)) * 3 // 4
+    tail_chars = max_chars - len(marker) - head_chars
+    head = text[:head_chars].rsplit(' ', 1)[0]
+    tail = text[-tail_chars:].split(' ', 1)[-1] if tail_chars > 0 else ''
+    return head + marker + tail
+
+def email_text(payload, max_tokens=800):
+    return compact(strip_quoted_and_signature(body_text(payload)), max_tokens)
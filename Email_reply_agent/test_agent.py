@@ -0,0 +1,145 @@
+import os
+import sys
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+from fake_gmail import FakeGmailService
+from gmail_sync import GmailSync, SyncCheckpoint
+from ledger import Ledger
+
+from common.llm_gateway import FATAL, RETRYABLE, LLMError
+
+class ScriptedLLM:
+    def __init__(self, fail_on=(), kind=RETRYABLE):
+        self.fail_on = set(fail_on)
+        self.kind = kind
+        self.calls = 0
+
+    def invoke(self, messages, **kwargs):
+        system, user = messages[0].content, messages[-1].content
+        self.calls += 1
+        if any(text in user for text in self.fail_on):
+            raise LLMError('LLM unavailable', kind=self.kind)
+        content = '{"needs_reply": true}' if 'needs_reply' in system else 'Hello,\nOn it.\nBest regards,'
+        return type('Response', (), {'content': content})()
+
+class CannedLLM:
+    def __init__(self, content):
+        self.content = content
+
+    def invoke(self, messages, **kwargs):
+        return type('Response', (), {'content': self.content})()
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    # Agent opens its state files relative to the working directory on import
+    monkeypatch.chdir(tmp_path)
+    import Agent
+    service = FakeGmailService()
+    monkeypatch.setattr(Agent, 'gmail_service', service)
+    monkeypatch.setattr(Agent, 'gmail_sync', GmailSync(SyncCheckpoint(str(tmp_path / 'sync.json'))))
+    monkeypatch.setattr(Agent, 'ledger', Ledger(str(tmp_path / 'ledger.sqlite3')))
+    yield Agent, service
+    Agent.ledger.close()
+
+def test_failed_email_is_refetched_next_cycle(agent, monkeypatch):
+    Agent, service = agent
+    Agent.gmail_sync.commit(service.history_id)
+    answered = service.add_message('Quote', 'dan@example.org', 'Could you send a quote?')
+    failing = service.add_message('Contract', 'eve@example.org', 'Please review the contract.')
+    checkpoint = Agent.gmail_sync.checkpoint.load()
+    monkeypatch.setattr(Agent, 'EMAIL_RETRY_DELAY', 0)
+
+    # The branch for `failing` errors out; its sibling is still answered
+    monkeypatch.setattr(Agent, 'llm', ScriptedLLM(fail_on=['Please review']))
+    result = Agent.run_cycle(Agent.parallel_app)
+    assert [r['id'] for r in result['results'] if 'error' in r] == [failing]
+    assert [body['threadId'] for body in service.sent] == [service.messages[answered]['threadId']]
+    assert Agent.gmail_sync.checkpoint.load() == checkpoint
+
+    # Same history window again: the answered email is skipped, the failed one
+    # replied to (a retry, so not counted as new mail for the poll interval)
+    monkeypatch.setattr(Agent, 'llm', ScriptedLLM())
+    result = Agent.run_cycle(Agent.parallel_app)
+    assert result['fetched'] == 0
+    assert [body['threadId'] for body in service.sent] == [
+        service.messages[answered]['threadId'], service.messages[failing]['threadId']]
+    assert 'UNREAD' not in service.messages[failing]['labelIds']
+    assert Agent.gmail_sync.checkpoint.load() == str(service.history_id)
+
+def test_failing_email_backs_off_then_is_given_up(agent, monkeypatch):
+    Agent, service = agent
+    Agent.gmail_sync.commit(service.history_id)
+    failing = service.add_message('Contract', 'eve@example.org', 'Please review the contract.')
+    checkpoint = Agent.gmail_sync.checkpoint.load()
+    monkeypatch.setattr(Agent, 'EMAIL_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(Agent, 'EMAIL_RETRY_DELAY', 3600)
+    llm = ScriptedLLM(fail_on=['Please review'])
+    monkeypatch.setattr(Agent, 'llm', llm)
+
+    result = Agent.run_cycle(Agent.parallel_app)
+    assert result['fetched'] == 1 and llm.calls == 1
+    assert Agent.gmail_sync.checkpoint.load() == checkpoint
+
+    # Retry not due yet: no LLM call, no new work, checkpoint still held
+    result = Agent.run_cycle(Agent.parallel_app)
+    assert result['fetched'] == 0 and result['deferred'] == [failing] and llm.calls == 1
+    assert Agent.gmail_sync.checkpoint.load() == checkpoint
+
+    # Due again and failing for the last allowed time: given up, checkpoint advances
+    monkeypatch.setattr(Agent.time, 'time', lambda: 2 ** 40)
+    result = Agent.run_cycle(Agent.parallel_app)
+    assert result['results'] == [{'id': failing, 'error': 'LLM unavailable', 'gave_up': True}]
+    assert Agent.gmail_sync.checkpoint.load() == str(service.history_id)
+    assert service.sent == [] and 'UNREAD' in service.messages[failing]['labelIds']
+
+def test_fatal_llm_error_gives_up_at_once(agent, monkeypatch):
+    Agent, service = agent
+    Agent.gmail_sync.commit(service.history_id)
+    failing = service.add_message('Contract', 'eve@example.org', 'Please review the contract.')
+    monkeypatch.setattr(Agent, 'llm', ScriptedLLM(fail_on=['Please review'], kind=FATAL))
+    Agent.run_cycle(Agent.parallel_app)
+    assert Agent.ledger.get(failing)['gave_up']
+    assert Agent.gmail_sync.checkpoint.load() == str(service.history_id)
+
+def test_unsent_reply_is_retried_next_cycle(agent, monkeypatch):
+    Agent, service = agent
+    message_id = service.add_message('Quote', 'dan@example.org', 'Could you send a quote?')
+    monkeypatch.setattr(Agent, 'llm', ScriptedLLM())
+
+    send, outage = service._send, [True]
+
+    def flaky_send(userId, body):
+        if outage[0]:
+            raise HttpError(httplib2.Response({'status': 500}), b'{}')
+        return send(userId, body)
+
+    monkeypatch.setattr(service, '_send', flaky_send)
+    Agent.run_cycle(Agent.parallel_app)
+    assert service.sent == []
+    assert Agent.ledger.pending_send() == {message_id: 'Hello,\nOn it.\nBest regards,'}
+
+    # Nothing new arrives, but the drafted reply goes out and the email is marked read
+    outage[0] = False
+    monkeypatch.setattr(Agent, 'llm', ScriptedLLM(fail_on=['Could you send']))
+    result = Agent.run_cycle(Agent.parallel_app)
+    assert result['fetched'] == 0
+    assert [body['threadId'] for body in service.sent] == [service.messages[message_id]['threadId']]
+    assert 'UNREAD' not in service.messages[message_id]['labelIds']
+    assert Agent.ledger.pending_send() == {}
+
+@pytest.mark.parametrize('content, expected', [
+    ("{'needs_reply': true}", True),
+    ('```json\n{"needs_reply": false}\n```', False),
+    ('Sure! {"needs_reply": "yes"}', True),
+    ('I cannot tell.', False),
+])
+def test_assessment_output_is_parsed_leniently(agent, monkeypatch, content, expected):
+    Agent, _ = agent
+    monkeypatch.setattr(Agent, 'llm', CannedLLM(content))
+    email = {'id': 'm1', 'subject': 'Invoice', 'body': 'Can you confirm the PO number?'}
+    assert Agent.assess_with_llm(email) is expected
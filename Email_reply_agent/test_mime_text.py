@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from mime_text import html_to_text, strip_quoted_and_signature
+
+def test_bottom_posted_reply_is_kept():
+    text = ("On Mon, 3 Jun 2024 at 09:12, Dan <dan@example.org> wrote:\n"
+            "> Can we meet Tuesday?\n\n"
+            "Tuesday works, but could you send the agenda first?")
+    assert strip_quoted_and_signature(text).strip() == "Tuesday works, but could you send the agenda first?"
+
+def test_top_posted_reply_drops_quoted_history():
+    text = ("Tuesday works.\n\n"
+            "On Mon, 3 Jun 2024 at 09:12, Dan\n<dan@example.org> wrote:\n"
+            "> Can we meet Tuesday?\n>\n> Dan\n")
+    assert strip_quoted_and_signature(text).strip() == "Tuesday works."
+
+def test_inline_replies_keep_every_answer():
+    text = ("On Mon, Dan wrote:\n> Can we meet Tuesday?\nYes, at 10.\n"
+            "> Should I book a room?\nPlease do.\n-- \nEve")
+    assert strip_quoted_and_signature(text).split() == ["Yes,", "at", "10.", "Please", "do."]
+
+def test_html_quote_ends_at_its_own_closing_tag():
+    html = ('<div>See you then.</div>'
+            '<div class="gmail_quote"><div>On Mon, Dan wrote:</div>'
+            '<blockquote><p>Can we meet<li>Tuesday?</blockquote></div>'
+            '<p>Also, bring the slides.</p>')
+    assert html_to_text(html).split() == ["See", "you", "then.", "Also,", "bring", "the", "slides."]
+
+def test_html_blockquote_with_unclosed_paragraphs():
+    html = "<blockquote><p>Quoted one<p>Quoted two</blockquote><p>Reply text"
+    assert html_to_text(html).split() == ["Reply", "text"]
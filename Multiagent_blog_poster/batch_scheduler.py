@@ -0,0 +1,293 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Token bucket shared by every caller of one upstream. `rate` is tokens per
+# second and `capacity` the largest burst; acquire() waits until a token is free.
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.waits = 0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Waiters queue on the lock so tokens are handed out in arrival order
+        async with self._lock:
+            self._refill()
+            if self.tokens < tokens:
+                self.waits += 1
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+    def snapshot(self) -> Dict[str, float]:
+        self._refill()
+        return {"rate_per_minute": self.rate * 60, "capacity": self.capacity, "available": self.tokens, "waits": self.waits}
+
+# One submitted batch. Results are kept per topic in submission order, and
+# every state change is appended to an event log that stream readers follow.
+class BatchJob:
+    def __init__(self, topics: List[str]):
+        self.id = uuid.uuid4().hex
+        self.topics = topics
+        self.results: List[Dict[str, Any]] = [{"topic": topic, "status": "pending"} for topic in topics]
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._events: List[Dict[str, Any]] = []
+        self._cond: Optional[asyncio.Condition] = None
+        self._store: Optional["BatchStore"] = None
+
+    @property
+    def completed(self) -> int:
+        return sum(1 for r in self.results if r["status"] == "done")
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.results if r["status"] == "failed")
+
+    def throughput(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return (self.completed + self.failed) / (elapsed / 60) if elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "batch_id": self.id,
+            "status": "finished" if self.finished_at is not None else ("running" if self.started_at else "pending"),
+            "total": len(self.topics),
+            "completed": self.completed,
+            "failed": self.failed,
+            "topics_per_minute": round(self.throughput(), 2),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.summary(), "results": self.results}
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def _publish(self, event: Dict[str, Any]) -> None:
+        cond = self._condition()
+        async with cond:
+            self._events.append(event)
+            cond.notify_all()
+        if self._store is not None:
+            await self._store.save(self, len(self._events) - 1, event)
+
+    async def events(self):
+        cond = self._condition()
+        seen = 0
+        while True:
+            async with cond:
+                await cond.wait_for(lambda: seen < len(self._events))
+                pending = self._events[seen:]
+            for event in pending:
+                seen += 1
+                yield event
+                if event["event"] == "batch_done":
+                    return
+
+# SQLite copy of every batch's snapshot and event log. API workers are separate
+# processes, so a batch submitted to one worker is polled or streamed from the
+# others through this store. `encode` turns results into JSON-safe values.
+class BatchStore:
+    def __init__(self, path: str, encode: Callable[[Any], Any] = lambda value: value, poll_interval: float = 0.5):
+        self.path = path
+        self.encode = encode
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id TEXT PRIMARY KEY, snapshot TEXT NOT NULL, finished INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS batch_events ("
+                "batch_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, PRIMARY KEY (batch_id, seq))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _save(self, batch_id: str, snapshot: str, finished: bool, created_at: float, seq: Optional[int], event: Optional[str]) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO batches (id, snapshot, finished, created_at) VALUES (?, ?, ?, ?)",
+                (batch_id, snapshot, int(finished), created_at),
+            )
+            if event is not None:
+                db.execute("INSERT OR REPLACE INTO batch_events (batch_id, seq, event) VALUES (?, ?, ?)", (batch_id, seq, event))
+            db.commit()
+
+    def _prune(self, keep: int) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "DELETE FROM batches WHERE finished = 1 AND id NOT IN "
+                "(SELECT id FROM batches ORDER BY created_at DESC LIMIT ?)",
+                (keep,),
+            )
+            db.execute("DELETE FROM batch_events WHERE batch_id NOT IN (SELECT id FROM batches)")
+            db.commit()
+
+    def _load(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute("SELECT snapshot FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return json.loads(row["snapshot"]) if row is not None else None
+
+    def _events_after(self, batch_id: str, seq: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT event FROM batch_events WHERE batch_id = ? AND seq > ? ORDER BY seq", (batch_id, seq)
+            ).fetchall()
+        return [json.loads(row["event"]) for row in rows]
+
+    # Async API: all index I/O runs off the event loop
+    async def save(self, job: BatchJob, seq: Optional[int] = None, event: Optional[Dict[str, Any]] = None) -> None:
+        snapshot = json.dumps(self.encode(job.snapshot()))
+        encoded = json.dumps(self.encode(event)) if event is not None else None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._save, job.id, snapshot, job.finished_at is not None, job.created_at, seq, encoded)
+
+    async def prune(self, keep: int) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._prune, keep)
+
+    async def load(self, batch_id: str) -> Optional["StoredBatch"]:
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, self._load, batch_id)
+        return StoredBatch(self, snapshot) if snapshot is not None else None
+
+    async def events(self, batch_id: str):
+        loop = asyncio.get_running_loop()
+        seen = -1
+        while True:
+            pending = await loop.run_in_executor(None, self._events_after, batch_id, seen)
+            for event in pending:
+                seen += 1
+                yield event
+                if event["event"] == "batch_done":
+                    return
+            if not pending:
+                await asyncio.sleep(self.poll_interval)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Read-only view of a batch owned by another worker, with the same
+# summary/snapshot/events interface as BatchJob
+class StoredBatch:
+    def __init__(self, store: BatchStore, snapshot: Dict[str, Any]):
+        self.store = store
+        self.id = snapshot["batch_id"]
+        self._snapshot = snapshot
+
+    def summary(self) -> Dict[str, Any]:
+        return {k: v for k, v in self._snapshot.items() if k != "results"}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self._snapshot
+
+    def events(self):
+        return self.store.events(self.id)
+
+# Runs batches of topics through `run_topic` under one global concurrency cap
+# shared by all batches. Upstream rate limits are enforced by the token buckets
+# the pipeline itself acquires, so a batch can't outrun the API quotas.
+class BatchScheduler:
+    def __init__(self, run_topic: Callable[[str], Awaitable[Any]], max_concurrency: int = 4, max_batches: int = 100,
+                 store: Optional[BatchStore] = None):
+        self.run_topic = run_topic
+        self.store = store
+        self.max_concurrency = max_concurrency
+        self.max_batches = max_batches
+        self.batches: "OrderedDict[str, BatchJob]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, topics: List[str]) -> BatchJob:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        job = BatchJob(topics)
+        job._store = self.store
+        self.batches[job.id] = job
+        # Forget the oldest finished batches once over the retention limit
+        for batch_id in [b for b, j in self.batches.items() if j.finished_at is not None][:max(0, len(self.batches) - self.max_batches)]:
+            del self.batches[batch_id]
+        if self.store is not None:
+            # Recorded before the id is returned, so any worker can answer for it
+            await self.store.save(job)
+            await self.store.prune(self.max_batches)
+        task = asyncio.ensure_future(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    def get(self, batch_id: str) -> Optional[BatchJob]:
+        return self.batches.get(batch_id)
+
+    # Batches run by this process first, then ones recorded by other workers
+    async def find(self, batch_id: str):
+        job = self.batches.get(batch_id)
+        if job is None and self.store is not None:
+            return await self.store.load(batch_id)
+        return job
+
+    async def _run_one(self, job: BatchJob, index: int) -> None:
+        entry = job.results[index]
+        async with self._semaphore:
+            entry["status"] = "running"
+            started = time.monotonic()
+            try:
+                entry["result"] = await self.run_topic(entry["topic"])
+                entry["status"] = "done"
+            except Exception as e:
+                entry["status"] = "failed"
+                entry["error"] = getattr(e, "detail", None) or str(e)
+            entry["seconds"] = round(time.monotonic() - started, 3)
+        await job._publish({"event": "topic_done", "index": index, **entry})
+
+    async def _run(self, job: BatchJob) -> None:
+        job.started_at = time.time()
+        try:
+            await asyncio.gather(*(self._run_one(job, i) for i in range(len(job.topics))))
+        finally:
+            job.finished_at = time.time()
+            await job._publish({"event": "batch_done", **job.summary()})
+
+    async def shutdown(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
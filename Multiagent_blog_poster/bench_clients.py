@@ -0,0 +1,67 @@
+import argparse
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import clients
+
+# Per-request client overhead against a local stub server (no network needed):
+#   - a fresh requests.get (new connection) per call vs. the pooled keep-alive session
+#   - building the YouTube discovery client per call vs. the cached per-thread client
+#
+#   python bench_clients.py --requests 500
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out in separate writes; without this, Nagle plus
+        # delayed ACKs add ~40 ms to every reused connection
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        body = b'{"items": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def timed(label: str, count: int, call) -> None:
+    started = time.perf_counter()
+    for _ in range(count):
+        call()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} {elapsed / count * 1000:8.3f} ms/request")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--builds", type=int, default=20)
+    args = parser.parse_args()
+
+    import requests
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/youtube/v3/search"
+
+    timed("new connection per request", args.requests, lambda: requests.get(url).close())
+    session = clients.http_session()
+    timed("pooled keep-alive session", args.requests, lambda: session.get(url).content)
+
+    try:
+        from googleapiclient.discovery import build
+    except ImportError:
+        print("google-api-python-client not installed; skipping discovery client benchmark")
+    else:
+        timed("build YouTube client per request", args.builds,
+              lambda: build('youtube', 'v3', developerKey="stub", cache_discovery=False, static_discovery=True))
+        timed("cached YouTube client", args.builds, lambda: clients.youtube_client("stub"))
+
+    server.shutdown()
+    clients.close_all()
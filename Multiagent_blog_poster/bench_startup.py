@@ -0,0 +1,68 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+# Import-time and cold-start benchmark for the API server.
+#
+#   python bench_startup.py            # import time: lazy app vs. app + eager SDK imports
+#   python bench_startup.py --serve    # also time server.py until it answers HTTP
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# What importing the app used to pull in eagerly
+EAGER_IMPORTS = [
+    "streamlit",
+    "googleapiclient.discovery",
+    "arxiv",
+    "youtube_transcript_api",
+    "numpy",
+]
+
+def time_import(statement: str, rounds: int) -> list:
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=APP_DIR, check=True)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def time_cold_start(port: int, workers: int, timeout: float = 60.0) -> float:
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "server.py", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=APP_DIR,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/openapi.json", timeout=1):
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("server did not come up")
+    finally:
+        process.terminate()
+        process.wait()
+
+def report(label: str, timings: list) -> None:
+    print(f"{label:<32} median {statistics.median(timings) * 1000:8.1f} ms   min {min(timings) * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    report("python startup", time_import("pass", args.rounds))
+    report("import app (lazy)", time_import("import multi_agent_blog_system", args.rounds))
+    report("import app + eager SDKs", time_import(
+        "import multi_agent_blog_system, " + ", ".join(EAGER_IMPORTS), args.rounds))
+    if args.serve:
+        report(f"cold start ({args.workers} worker(s))",
+               [time_cold_start(args.port, args.workers) for _ in range(args.rounds)])
@@ -0,0 +1,80 @@
+import functools
+import os
+import threading
+from typing import Iterator, List
+
+# Managed outbound clients. The YouTube discovery client, arXiv client and HTTP
+# sessions are built once per research thread and reused, so requests stop paying
+# for rebuilding client objects and opening fresh connections. Per-thread rather
+# than shared because googleapiclient's httplib2 transport isn't thread-safe.
+#
+# Every client gets a socket timeout: the caller's asyncio.wait_for only stops
+# waiting and can't stop the worker thread, so without one a hung connection
+# would hold a research thread indefinitely.
+
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "10"))
+
+_local = threading.local()
+_sessions = []
+_sessions_lock = threading.Lock()
+
+def new_http_session(timeout: float = HTTP_TIMEOUT):
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    # requests has no session-wide timeout, so default one on every call (callers can still override it)
+    session.request = functools.partial(session.request, timeout=timeout)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    with _sessions_lock:
+        _sessions.append(session)
+    return session
+
+def http_session(timeout: float = HTTP_TIMEOUT):
+    session = getattr(_local, "http_session", None)
+    if session is None:
+        session = new_http_session(timeout)
+        _local.http_session = session
+    return session
+
+def youtube_client(api_key: str, timeout: float = HTTP_TIMEOUT):
+    client = getattr(_local, "youtube", None)
+    if client is None:
+        import httplib2
+        from googleapiclient.discovery import build
+        # The discovery document ships with the library; no fetch or file cache needed
+        client = build('youtube', 'v3', developerKey=api_key, cache_discovery=False, static_discovery=True,
+                       http=httplib2.Http(timeout=timeout))
+        _local.youtube = client
+    return client
+
+def arxiv_client(timeout: float = HTTP_TIMEOUT):
+    client = getattr(_local, "arxiv", None)
+    if client is None:
+        import arxiv
+        # Rate limiting is done by the arXiv token bucket, so the client's own delay is dropped
+        client = arxiv.Client(page_size=10, delay_seconds=0, num_retries=2)
+        # arxiv.Client takes no timeout; it pages through its own requests session, so swap in one that has it
+        if hasattr(client, "_session"):
+            client._session = new_http_session(timeout)
+        _local.arxiv = client
+    return client
+
+def transcript_texts(video_id: str, languages: List[str], timeout: float = HTTP_TIMEOUT) -> Iterator[str]:
+    from youtube_transcript_api import YouTubeTranscriptApi
+    if hasattr(YouTubeTranscriptApi, "fetch"):
+        # youtube-transcript-api >= 1.0 accepts a pooled session (and with it our timeout)
+        api = getattr(_local, "transcript_api", None)
+        if api is None:
+            api = YouTubeTranscriptApi(http_client=http_session(timeout))
+            _local.transcript_api = api
+        return (snippet.text for snippet in api.fetch(video_id, languages=languages))
+    return (entry['text'] for entry in YouTubeTranscriptApi.get_transcript(video_id, languages=languages))
+
+def close_all() -> None:
+    with _sessions_lock:
+        for session in _sessions:
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Content-addressed draft storage. Each draft is written once under a name that
+# includes its SHA-256, atomically (temp file + rename), and recorded in a small
+# SQLite index so listing and lookups never scan the drafts directory.
+
+# Topic filters match case- and whitespace-insensitively, like research_cache.topic_key
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+class DraftStore:
+    def __init__(self, root: str = "drafts", index_name: str = "index.sqlite3"):
+        self.root = root
+        self.index_path = os.path.join(root, index_name)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"writes": 0, "deduplicated": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS drafts ("
+                "hash TEXT PRIMARY KEY, topic TEXT NOT NULL, title TEXT NOT NULL, "
+                "path TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL, topic_key TEXT)"
+            )
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(drafts)")}
+            if "topic_key" not in columns:
+                # Index created before topic keys: add the column and backfill it
+                self._conn.execute("ALTER TABLE drafts ADD COLUMN topic_key TEXT")
+                self._conn.executemany(
+                    "UPDATE drafts SET topic_key = ? WHERE hash = ?",
+                    [(normalize_topic(row["topic"]), row["hash"]) for row in self._conn.execute("SELECT hash, topic FROM drafts")],
+                )
+            self._conn.execute("DROP INDEX IF EXISTS drafts_topic")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS drafts_topic_key ON drafts (topic_key, created_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS drafts_created ON drafts (created_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _atomic_write(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".draft-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _save(self, topic: str, title: str, content: str) -> Dict[str, Any]:
+        data = content.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT * FROM drafts WHERE hash = ?", (digest,)).fetchone()
+            if row is not None and os.path.exists(row["path"]):
+                self.stats["deduplicated"] += 1
+                return {**dict(row), "deduplicated": True}
+            safe_title = re.sub(r'[^\w\s-]', '', title).replace(' ', '_').lower()
+            path = os.path.abspath(os.path.join(self.root, f"{safe_title}_{digest[:12]}.md"))
+            if not os.path.exists(path):
+                self._atomic_write(path, data)
+            record = {"hash": digest, "topic": topic, "title": title, "path": path, "size": len(data),
+                      "created_at": time.time(), "topic_key": normalize_topic(topic)}
+            db.execute(
+                "INSERT OR REPLACE INTO drafts (hash, topic, title, path, size, created_at, topic_key) "
+                "VALUES (:hash, :topic, :title, :path, :size, :created_at, :topic_key)",
+                record,
+            )
+            db.commit()
+            self.stats["writes"] += 1
+            return {**record, "deduplicated": False}
+
+    def _list(self, topic: Optional[str], limit: int, offset: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            db = self._db()
+            if topic is None:
+                rows = db.execute(
+                    "SELECT * FROM drafts ORDER BY created_at DESC LIMIT ? OFFSET ?", (limit, offset)
+                ).fetchall()
+            else:
+                rows = db.execute(
+                    "SELECT * FROM drafts WHERE topic_key = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                    (normalize_topic(topic), limit, offset),
+                ).fetchall()
+            return [dict(row) for row in rows]
+
+    def _get(self, digest: str, with_content: bool) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute("SELECT * FROM drafts WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        if with_content:
+            with open(record["path"], encoding="utf-8") as f:
+                record["content"] = f.read()
+        return record
+
+    # Async API: all file and index I/O runs off the event loop
+    async def save(self, topic: str, title: str, content: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._save, topic, title, content)
+
+    async def list_drafts(self, topic: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._list, topic, limit, offset)
+
+    async def get(self, digest: str, with_content: bool = True) -> Optional[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._get, digest, with_content)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,144 @@
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+# Minimal Prometheus-style metrics (counters, gauges, histograms with labels)
+# rendered in the text exposition format. Values are per process, so with
+# several uvicorn workers each worker reports its own series.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _label_str(labels: Tuple[Tuple[str, str], ...], extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_label_str(key)} {value}"
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            series = self.values.get(key)
+            if series is None:
+                # Per-bucket counts, then sum and count
+                series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_label_str(key, [('le', repr(bound))])} {cumulative}"
+            yield f"{self.name}_bucket{_label_str(key, [('le', '+Inf')])} {series[-1]}"
+            yield f"{self.name}_sum{_label_str(key)} {series[-2]}"
+            yield f"{self.name}_count{_label_str(key)} {series[-1]}"
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        with _lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram("blog_stage_duration_seconds", "Time spent in each pipeline agent."))
+stage_errors = registry.register(Counter("blog_stage_errors_total", "Pipeline agent failures."))
+stage_in_flight = registry.register(Gauge("blog_stage_in_flight", "Pipeline agents currently running."))
+upstream_seconds = registry.register(Histogram("blog_upstream_duration_seconds", "Latency of upstream API calls."))
+upstream_errors = registry.register(Counter("blog_upstream_errors_total", "Failed upstream API calls."))
+upstream_in_flight = registry.register(Gauge("blog_upstream_in_flight", "Upstream API calls currently running."))
+request_seconds = registry.register(Histogram("blog_http_request_duration_seconds", "HTTP request latency by route."))
+
+# Trace id of the request being handled, set by the HTTP middleware
+trace_id_var: contextvars.ContextVar = contextvars.ContextVar("trace_id", default=None)
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+def current_trace_id() -> Optional[str]:
+    return trace_id_var.get()
+
+@contextlib.contextmanager
+def _timed(histogram: Histogram, errors: Counter, in_flight: Gauge, **labels):
+    in_flight.inc(**labels)
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        # Cancellation (client disconnect, shutdown) is a BaseException and isn't counted as an error
+        errors.inc(**labels)
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+        in_flight.dec(**labels)
+
+def track_stage(stage: str):
+    return _timed(stage_seconds, stage_errors, stage_in_flight, stage=stage)
+
+# Decorator for async agents; the stage label is the function name
+def instrument_stage(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with track_stage(func.__name__):
+            return await func(*args, **kwargs)
+    return wrapper
+
+def track_upstream(upstream: str, call: str):
+    return _timed(upstream_seconds, upstream_errors, upstream_in_flight, upstream=upstream, call=call)
@@ -1,22 +1,43 @@
 import asyncio
+import contextlib
+import functools
+import itertools
 import json
 import os
-from fastapi import FastAPI, HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import re
 import platform
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import arxiv
-from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
-from datetime import datetime
-import streamlit as st
-import aiohttp
+import time
+from research_cache import ResearchCache, topic_key
+from batch_scheduler import BatchScheduler, BatchStore, TokenBucket
+from draft_store import DraftStore
+import clients
+import metrics
+from metrics import instrument_stage
+
+# Heavy SDKs (googleapiclient, arxiv, youtube_transcript_api, numpy) are imported
+# on first use inside the functions that need them, and streamlit/requests only by
+# the front end, so API workers (see server.py) start without loading them.
 
 # FastAPI setup
-app = FastAPI()
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Shutdown: stop queued batch work, then release executors, pooled clients and SQLite handles
+    await batch_scheduler.shutdown()
+    batch_store.close()
+    research_executor.shutdown(wait=False)
+    clients.close_all()
+    research_cache.close()
+    draft_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS setup for potential API access
 app.add_middleware(
@@ -25,15 +46,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Per-request trace id (taken from X-Trace-Id or generated) and route latency
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    trace_id = request.headers.get("X-Trace-Id") or metrics.new_trace_id()
+    token = metrics.trace_id_var.set(trace_id)
+    started = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.request_seconds.observe(
+            time.perf_counter() - started,
+            route=route.path if route is not None else "unmatched",
+            method=request.method,
+            status=status,
+        )
+        metrics.trace_id_var.reset(token)
+
 # API keys (replace with your own)
 YOUTUBE_API_KEY = "YOUR_YOUTUBE_API_KEY"  # Get from Google Cloud Console
 
+# Research cache (memory LRU in front of SQLite; TTLs per source via RESEARCH_CACHE_TTL_<SOURCE>)
+research_cache = ResearchCache(
+    path=os.environ.get("RESEARCH_CACHE_PATH", "research_cache.sqlite3"),
+    max_entries=int(os.environ.get("RESEARCH_CACHE_MAX_ENTRIES", "256")),
+)
+
+# Draft store (drafts deduplicated by content hash, indexed in drafts/index.sqlite3)
+draft_store = DraftStore(root=os.environ.get("DRAFTS_DIR", "drafts"))
+
 # Data models
 class UserPrompt(BaseModel):
     topic: str
 
+class BatchPrompt(BaseModel):
+    topics: List[str]
+
 class TopicData(BaseModel):
     title: str
     tags: List[str]
@@ -53,117 +109,251 @@ class BlogPost(BaseModel):
     content: str
     tags: List[str]
 
-# YouTube API search
-async def youtube_search(topic: str) -> List[Dict]:
+# Research executor: the YouTube, transcript and arXiv SDKs are blocking, so they
+# run on a bounded thread pool instead of the event loop
+RESEARCH_MAX_WORKERS = int(os.environ.get("RESEARCH_MAX_WORKERS", "16"))
+YOUTUBE_SEARCH_TIMEOUT = float(os.environ.get("YOUTUBE_SEARCH_TIMEOUT", "10"))
+TRANSCRIPT_TIMEOUT = float(os.environ.get("TRANSCRIPT_TIMEOUT", "10"))
+ARXIV_SEARCH_TIMEOUT = float(os.environ.get("ARXIV_SEARCH_TIMEOUT", "20"))
+RESEARCH_TIMEOUT_GRACE = float(os.environ.get("RESEARCH_TIMEOUT_GRACE", "5"))
+research_executor = ThreadPoolExecutor(max_workers=RESEARCH_MAX_WORKERS, thread_name_prefix="research")
+
+# Per-upstream rate limits, shared by single and batch requests so bursts can't trip quotas.
+# The buckets live in each API worker process, so the configured quota is split
+# evenly across BLOG_API_WORKERS (set by server.py --workers).
+API_WORKERS = max(1, int(os.environ.get("BLOG_API_WORKERS", "1")))
+youtube_rate_limit = TokenBucket(
+    rate=float(os.environ.get("YOUTUBE_REQUESTS_PER_MINUTE", "30")) / 60 / API_WORKERS,
+    capacity=max(1.0, float(os.environ.get("YOUTUBE_BURST", "5")) / API_WORKERS),
+)
+arxiv_rate_limit = TokenBucket(
+    rate=float(os.environ.get("ARXIV_REQUESTS_PER_MINUTE", "20")) / 60 / API_WORKERS,
+    capacity=max(1.0, float(os.environ.get("ARXIV_BURST", "1")) / API_WORKERS),
+)
+
+# The clients carry socket timeouts of their own (see clients.py), which is what
+# frees the worker thread; wait_for is only a backstop for calls that retry or
+# page past them, and can't stop the thread itself
+async def run_blocking(func, *args, timeout: float, **kwargs):
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    return await asyncio.wait_for(loop.run_in_executor(research_executor, call), timeout=timeout + RESEARCH_TIMEOUT_GRACE)
+
+def _youtube_search_items(topic: str) -> List[Dict]:
+    from googleapiclient.errors import HttpError
     try:
-        youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
+        youtube = clients.youtube_client(YOUTUBE_API_KEY, timeout=YOUTUBE_SEARCH_TIMEOUT)
         request = youtube.search().list(q=topic, part='snippet', maxResults=3, type='video')
-        response = request.execute()
-        videos = []
-        for item in response['items']:
-            video_id = item['id']['videoId']
-            title = item['snippet']['title']
-            try:
-                transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
-                transcript_text = " ".join([entry['text'] for entry in transcript])
-            except NoTranscriptFound:
-                transcript_text = "No transcript available."
-            videos.append({
-                'video_id': video_id,
-                'title': title,
-                'transcript': transcript_text[:1000]  # Limit for brevity
-            })
-        return videos
+        with metrics.track_upstream("youtube", "search"):
+            return request.execute()['items']
     except HttpError as e:
         raise HTTPException(status_code=500, detail=f"YouTube API error: {str(e)}")
 
-# Arxiv API search
-async def arxiv_search(topic: str) -> List[Dict]:
+# Transcript entries are consumed lazily and ingestion stops once there is
+# enough text to summarize, instead of joining the whole video
+TRANSCRIPT_MAX_CHARS = int(os.environ.get("TRANSCRIPT_MAX_CHARS", "6000"))
+
+def _fetch_transcript(video_id: str) -> Optional[str]:
+    from youtube_transcript_api import NoTranscriptFound
+    parts, size = [], 0
+    with metrics.track_upstream("youtube", "transcript"):
+        try:
+            texts = clients.transcript_texts(video_id, languages=['en'], timeout=TRANSCRIPT_TIMEOUT)
+        except NoTranscriptFound:
+            return None
+        for text in texts:
+            parts.append(text)
+            size += len(text) + 1
+            if size >= TRANSCRIPT_MAX_CHARS:
+                break
+    return " ".join(parts)
+
+# Returns (text, failed). failed is set when the fetch timed out or errored, as
+# opposed to the video having no transcript, so the result isn't cached for long.
+async def fetch_transcript(video_id: str) -> Tuple[str, bool]:
+    failed = False
     try:
-        search = arxiv.Search(query=topic, max_results=3, sort_by=arxiv.SortCriterion.SubmittedDate)
-        papers = []
-        for result in search.results():
-            papers.append({
+        transcript_text = await run_blocking(_fetch_transcript, video_id, timeout=TRANSCRIPT_TIMEOUT)
+    except Exception:
+        transcript_text, failed = None, True
+    return transcript_text or "No transcript available.", failed
+
+# YouTube API search
+async def youtube_search(topic: str) -> List[Dict]:
+    await youtube_rate_limit.acquire()
+    try:
+        items = await run_blocking(_youtube_search_items, topic, timeout=YOUTUBE_SEARCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="YouTube API timed out")
+    # Fetch every video's transcript concurrently
+    transcripts = await asyncio.gather(*(fetch_transcript(item['id']['videoId']) for item in items))
+    return [
+        {
+            'video_id': item['id']['videoId'],
+            'title': item['snippet']['title'],
+            'transcript': transcript_text,
+            'transcript_failed': failed,
+        }
+        for item, (transcript_text, failed) in zip(items, transcripts)
+    ]
+
+def _arxiv_search_results(topic: str) -> List[Dict]:
+    import arxiv
+    search = arxiv.Search(query=topic, max_results=3, sort_by=arxiv.SortCriterion.SubmittedDate)
+    # results() is a lazy generator that pages over HTTP, so drain it here on the worker thread
+    results = clients.arxiv_client(timeout=ARXIV_SEARCH_TIMEOUT).results(search)
+    with metrics.track_upstream("arxiv", "search"):
+        return [
+            {
                 'paper_id': result.entry_id,
                 'title': result.title,
                 'abstract': result.summary
-            })
-        return papers
+            }
+            for result in itertools.islice(results, 3)
+        ]
+
+# Arxiv API search
+async def arxiv_search(topic: str) -> List[Dict]:
+    await arxiv_rate_limit.acquire()
+    try:
+        return await run_blocking(_arxiv_search_results, topic, timeout=ARXIV_SEARCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Arxiv API timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Arxiv API error: {str(e)}")
 
-# Save draft to local file
-async def save_draft(blog: BlogPost) -> str:
+# Save draft to the content-addressed draft store
+async def save_draft(blog: BlogPost, topic: Optional[str] = None) -> str:
     try:
-        os.makedirs("drafts", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_title = re.sub(r'[^\w\s-]', '', blog.title).replace(' ', '_').lower()
-        filename = f"drafts/{safe_title}_{timestamp}.md"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(blog.content)
-        return os.path.abspath(filename)
+        record = await draft_store.save(topic or blog.title, blog.title, blog.content)
+        return record["path"]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save draft: {str(e)}")
 
 # Agent 1: Prompt Reader
+@instrument_stage
 async def prompt_reader_agent(prompt: str) -> TopicData:
     title = prompt.capitalize()
     tags = [word.lower() for word in re.findall(r'\w+', prompt)[:5]]
     return TopicData(title=title, tags=tags)
 
 # Agent 2: YouTube Researcher
-async def youtube_researcher_agent(topic_data: TopicData) -> List[VideoSummary]:
-    videos = await youtube_search(topic_data.title)
-    summaries = []
-    for video in videos:
-        summary = f"Summary of '{video['title']}': {video['transcript'][:100]}..."
-        summaries.append(VideoSummary(video_id=video['video_id'], title=video['title'], summary=summary))
-    return summaries
+@instrument_stage
+async def youtube_researcher_agent(topic_data: TopicData) -> List[Dict]:
+    key = topic_key(topic_data.title, topic_data.tags)
+    return await research_cache.get_or_fetch(
+        "youtube", key, lambda: youtube_search(topic_data.title),
+        degraded=lambda videos: any(video.get('transcript_failed') for video in videos),
+    )
 
 # Agent 3: Paper Researcher
-async def paper_researcher_agent(topic_data: TopicData) -> List[PaperSummary]:
-    papers = await arxiv_search(topic_data.title)
-    summaries = []
-    for paper in papers:
-        summary = f"Summary of '{paper['title']}': {paper['abstract'][:100]}..."
-        summaries.append(PaperSummary(paper_id=paper['paper_id'], title=paper['title'], summary=summary))
-    return summaries
-
-# Agent 4: Blog Writer
-async def blog_writer_agent(topic_data: TopicData, video_summaries: List[VideoSummary], paper_summaries: List[PaperSummary]) -> BlogPost:
-    title = f"Exploring {topic_data.title}: Insights from Videos and Research"
-    content = f"# {title}\n\n"
+@instrument_stage
+async def paper_researcher_agent(topic_data: TopicData) -> List[Dict]:
+    key = topic_key(topic_data.title, topic_data.tags)
+    return await research_cache.get_or_fetch("arxiv", key, lambda: arxiv_search(topic_data.title))
+
+# Agent 4: Summarizer
+# Scores every video transcript and paper abstract of the request in one batched
+# TF-IDF pass (see summarizer.py) on the research executor
+SUMMARY_MAX_SENTENCES = int(os.environ.get("SUMMARY_MAX_SENTENCES", "3"))
+
+@instrument_stage
+async def summarizer_agent(videos: List[Dict], papers: List[Dict]) -> Tuple[List[VideoSummary], List[PaperSummary]]:
+    from summarizer import summarize_batch
+    documents = [video['transcript'] for video in videos] + [paper['abstract'] for paper in papers]
+    loop = asyncio.get_running_loop()
+    extracts = await loop.run_in_executor(
+        research_executor, functools.partial(summarize_batch, documents, max_sentences=SUMMARY_MAX_SENTENCES)
+    )
+    video_summaries = [
+        VideoSummary(video_id=video['video_id'], title=video['title'], summary=f"Summary of '{video['title']}': {extract}")
+        for video, extract in zip(videos, extracts[:len(videos)])
+    ]
+    paper_summaries = [
+        PaperSummary(paper_id=paper['paper_id'], title=paper['title'], summary=f"Summary of '{paper['title']}': {extract}")
+        for paper, extract in zip(papers, extracts[len(videos):])
+    ]
+    return video_summaries, paper_summaries
+
+# Agent 5: Blog Writer
+# Sections are built independently so the streaming endpoint can emit each one
+# as soon as its inputs are ready; blog_writer_agent joins them in order.
+BLOG_SECTIONS = ["introduction", "youtube", "papers", "conclusion"]
+
+def blog_title(topic_data: TopicData) -> str:
+    return f"Exploring {topic_data.title}: Insights from Videos and Research"
+
+def introduction_section(topic_data: TopicData) -> str:
+    content = f"# {blog_title(topic_data)}\n\n"
     content += f"## Introduction\nThis blog post dives into {topic_data.title}, combining insights from popular YouTube videos and cutting-edge research papers.\n\n"
-    content += "## YouTube Video Insights\n"
+    return content
+
+def youtube_section(video_summaries: List[VideoSummary]) -> str:
+    content = "## YouTube Video Insights\n"
     for vs in video_summaries:
         content += f"### {vs.title}\n{vs.summary}\n\n"
-    content += "## Research Paper Findings\n"
+    return content
+
+def papers_section(paper_summaries: List[PaperSummary]) -> str:
+    content = "## Research Paper Findings\n"
     for ps in paper_summaries:
         content += f"### {ps.title}\n{ps.summary}\n\n"
-    content += "## Conclusion\nThis exploration of {topic_data.title} shows the synergy between public media and academic research.\n\n"
+    return content
+
+def conclusion_section(topic_data: TopicData) -> str:
+    content = f"## Conclusion\nThis exploration of {topic_data.title} shows the synergy between public media and academic research.\n\n"
     content += f"**Keywords**: {', '.join(topic_data.tags)}"
-    return BlogPost(title=title, content=content, tags=topic_data.tags)
+    return content
+
+@instrument_stage
+async def blog_writer_agent(topic_data: TopicData, video_summaries: List[VideoSummary], paper_summaries: List[PaperSummary]) -> BlogPost:
+    content = "".join([
+        introduction_section(topic_data),
+        youtube_section(video_summaries),
+        papers_section(paper_summaries),
+        conclusion_section(topic_data),
+    ])
+    return BlogPost(title=blog_title(topic_data), content=content, tags=topic_data.tags)
+
+# Agent 6: Draft Saver
+@instrument_stage
+async def draft_saver_agent(blog: BlogPost, topic: Optional[str] = None) -> str:
+    return await save_draft(blog, topic)
+
+# Agent 7: Orchestrator
+async def run_pipeline(topic_data: TopicData) -> Dict:
+    youtube_task = youtube_researcher_agent(topic_data)
+    paper_task = paper_researcher_agent(topic_data)
+    videos, papers = await asyncio.gather(youtube_task, paper_task)
+    video_summaries, paper_summaries = await summarizer_agent(videos, papers)
+    blog = await blog_writer_agent(topic_data, video_summaries, paper_summaries)
+    draft_path = await draft_saver_agent(blog, topic_data.title)
+    return {
+        "topic": topic_data,
+        "video_summaries": video_summaries,
+        "paper_summaries": paper_summaries,
+        "blog": blog,
+        "draft_path": draft_path
+    }
 
-# Agent 5: Draft Saver
-async def draft_saver_agent(blog: BlogPost) -> str:
-    return await save_draft(blog)
+# In-flight pipelines keyed by normalized topic, so concurrent identical requests
+# share one run. Entries are removed as soon as the run finishes.
+inflight_pipelines: Dict[str, asyncio.Task] = {}
 
-# Agent 6: Orchestrator
+@instrument_stage
 async def orchestrator_agent(prompt: str) -> Dict:
     try:
         topic_data = await prompt_reader_agent(prompt)
-        youtube_task = youtube_researcher_agent(topic_data)
-        paper_task = paper_researcher_agent(topic_data)
-        video_summaries, paper_summaries = await asyncio.gather(youtube_task, paper_task)
-        blog = await blog_writer_agent(topic_data, video_summaries, paper_summaries)
-        draft_path = await draft_saver_agent(blog)
-        return {
-            "topic": topic_data,
-            "video_summaries": video_summaries,
-            "paper_summaries": paper_summaries,
-            "blog": blog,
-            "draft_path": draft_path
-        }
+        key = topic_key(topic_data.title, topic_data.tags)
+        task = inflight_pipelines.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_pipeline(topic_data))
+            inflight_pipelines[key] = task
+            task.add_done_callback(lambda _: inflight_pipelines.pop(key, None))
+        # Shield so one disconnecting client doesn't cancel the run for the other waiters
+        return await asyncio.shield(task)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -171,10 +361,146 @@ async def orchestrator_agent(prompt: str) -> Dict:
 @app.post("/generate-blog/")
 async def generate_blog(prompt: UserPrompt):
     result = await orchestrator_agent(prompt.topic)
-    return result
+    # Coalesced requests share one result dict, so the trace id goes on a copy
+    return {**result, "trace_id": metrics.current_trace_id()}
+
+# Streaming pipeline: yields one event per finished agent and one per blog
+# section, so clients can render the post while research is still running
+def section_event(name: str, content: str) -> Dict:
+    return {"event": "section", "index": BLOG_SECTIONS.index(name), "name": name, "content": content}
+
+async def stream_pipeline(prompt: str):
+    topic_data = await prompt_reader_agent(prompt)
+    yield {"event": "prompt_reader_agent", "topic": topic_data, "trace_id": metrics.current_trace_id()}
+    yield section_event("introduction", introduction_section(topic_data))
+
+    youtube_task = asyncio.ensure_future(youtube_researcher_agent(topic_data))
+    paper_task = asyncio.ensure_future(paper_researcher_agent(topic_data))
+    pending = {youtube_task, paper_task}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                # Each source is summarized as it lands so its section isn't held
+                # back by the slower one
+                if task is youtube_task:
+                    video_summaries, _ = await summarizer_agent(task.result(), [])
+                    yield {"event": "youtube_researcher_agent", "video_summaries": video_summaries}
+                    yield section_event("youtube", youtube_section(video_summaries))
+                else:
+                    _, paper_summaries = await summarizer_agent([], task.result())
+                    yield {"event": "paper_researcher_agent", "paper_summaries": paper_summaries}
+                    yield section_event("papers", papers_section(paper_summaries))
+    finally:
+        for task in pending:
+            task.cancel()
+
+    yield section_event("conclusion", conclusion_section(topic_data))
+    blog = await blog_writer_agent(topic_data, video_summaries, paper_summaries)
+    yield {"event": "blog_writer_agent", "blog": blog}
+    draft_path = await draft_saver_agent(blog, topic_data.title)
+    yield {"event": "draft_saver_agent", "draft_path": draft_path}
+
+async def ndjson_events(prompt: str):
+    try:
+        async for event in stream_pipeline(prompt):
+            yield json.dumps(jsonable_encoder(event)) + "\n"
+    except HTTPException as e:
+        yield json.dumps({"event": "error", "status_code": e.status_code, "detail": e.detail}) + "\n"
+    except Exception as e:
+        yield json.dumps({"event": "error", "status_code": 500, "detail": str(e)}) + "\n"
+
+@app.post("/generate-blog/stream")
+async def generate_blog_stream(prompt: UserPrompt):
+    return StreamingResponse(ndjson_events(prompt.topic), media_type="application/x-ndjson")
+
+# Batch generation: topics run through orchestrator_agent under a global
+# concurrency cap; poll the batch for partial results or stream them. Batch state
+# is mirrored to SQLite next to the drafts index so every API worker can serve it.
+BATCH_MAX_TOPICS = int(os.environ.get("BATCH_MAX_TOPICS", "1000"))
+batch_store = BatchStore(
+    os.path.join(os.environ.get("DRAFTS_DIR", "drafts"), "batches.sqlite3"),
+    encode=jsonable_encoder,
+)
+batch_scheduler = BatchScheduler(
+    orchestrator_agent,
+    max_concurrency=int(os.environ.get("BATCH_MAX_CONCURRENCY", "4")),
+    store=batch_store,
+)
+
+async def get_batch(batch_id: str):
+    job = await batch_scheduler.find(batch_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown batch: {batch_id}")
+    return job
+
+@app.post("/generate-blog/batch", status_code=202)
+async def generate_blog_batch(batch: BatchPrompt):
+    topics = [topic for topic in batch.topics if topic.strip()]
+    if not topics:
+        raise HTTPException(status_code=400, detail="No topics given")
+    if len(topics) > BATCH_MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"Batches are limited to {BATCH_MAX_TOPICS} topics")
+    return (await batch_scheduler.submit(topics)).summary()
+
+@app.get("/generate-blog/batch/{batch_id}")
+async def batch_status(batch_id: str):
+    return jsonable_encoder((await get_batch(batch_id)).snapshot())
+
+@app.get("/generate-blog/batch/{batch_id}/stream")
+async def batch_stream(batch_id: str):
+    job = await get_batch(batch_id)
+
+    async def events():
+        async for event in job.events():
+            yield json.dumps(jsonable_encoder(event)) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.get("/rate-limits")
+async def rate_limits():
+    return {"youtube": youtube_rate_limit.snapshot(), "arxiv": arxiv_rate_limit.snapshot()}
+
+# Draft endpoints
+@app.get("/drafts/")
+async def list_drafts(topic: Optional[str] = None, limit: int = 50, offset: int = 0):
+    return await draft_store.list_drafts(topic=topic, limit=min(limit, 500), offset=offset)
+
+@app.get("/drafts/{draft_hash}")
+async def get_draft(draft_hash: str):
+    record = await draft_store.get(draft_hash)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"Unknown draft: {draft_hash}")
+    return record
+
+# Prometheus-style metrics for this worker process
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# Research cache endpoints
+@app.get("/research-cache/stats")
+async def research_cache_stats():
+    return research_cache.snapshot()
+
+@app.delete("/research-cache/")
+async def invalidate_research_cache(topic: Optional[str] = None, source: Optional[str] = None):
+    key = None
+    if topic is not None:
+        topic_data = await prompt_reader_agent(topic)
+        key = topic_key(topic_data.title, topic_data.tags)
+    await research_cache.invalidate(source=source, topic=key)
+    return research_cache.snapshot()
 
 # Streamlit frontend
 def streamlit_app():
+    import streamlit as st
+
+    # One keep-alive session for every rerun and click, instead of a new client per click
+    @st.cache_resource
+    def api_session():
+        return clients.new_http_session()
+
     st.title("Blog Generator")
     st.write("Create SEO-friendly blog posts from a simple topic")
 
@@ -205,32 +531,71 @@ def streamlit_app():
     status_text = st.empty()
     status_text.text(st.session_state.status)
 
+    live_preview = st.empty()
+
+    # Progress added as each pipeline stage reports in (sums to 100)
+    stage_progress = {
+        "prompt_reader_agent": 10,
+        "youtube_researcher_agent": 35,
+        "paper_researcher_agent": 35,
+        "blog_writer_agent": 10,
+        "draft_saver_agent": 10,
+    }
+
+    def set_progress(value: int, status: str):
+        st.session_state.progress = value
+        st.session_state.status = status
+        progress_bar.progress(value)
+        status_text.text(status)
+
     # Handle button actions
-    async def run_orchestrator():
-        st.session_state.status = "Processing prompt..."
-        st.session_state.progress = 10
-        progress_bar.progress(st.session_state.progress)
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post("http://localhost:8000/generate-blog/", json={"topic": topic}) as response:
-                    st.session_state.progress = 60
-                    progress_bar.progress(st.session_state.progress)
-                    if response.status != 200:
-                        raise Exception(f"API error: {await response.text()}")
-                    st.session_state.result = await response.json()
-                    st.session_state.progress = 100
-                    progress_bar.progress(st.session_state.progress)
-                    st.session_state.status = "Blog generated successfully!"
-                    await asyncio.sleep(1)
-                    st.session_state.progress = 0
-                    progress_bar.progress(st.session_state.progress)
-            except Exception as e:
-                st.session_state.status = f"Error: {str(e)}"
-                st.session_state.progress = 0
-                progress_bar.progress(st.session_state.progress)
+    def run_orchestrator():
+        set_progress(0, "Processing prompt...")
+        result = {"video_summaries": [], "paper_summaries": []}
+        sections = {}
+        progress = 0
+        try:
+            # Read timeout is per chunk; a research stage can go quiet for its full timeout
+            with api_session().post("http://localhost:8000/generate-blog/stream", json={"topic": topic}, stream=True,
+                                    timeout=(10, 120)) as response:
+                if response.status_code != 200:
+                    raise Exception(f"API error: {response.text}")
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    name = event["event"]
+                    if name == "error":
+                        raise Exception(f"API error: {event['detail']}")
+                    if name == "section":
+                        sections[event["index"]] = event["content"]
+                        live_preview.markdown("".join(sections[i] for i in sorted(sections)))
+                        continue
+                    if name == "prompt_reader_agent":
+                        result["topic"] = event["topic"]
+                    elif name == "youtube_researcher_agent":
+                        result["video_summaries"] = event["video_summaries"]
+                    elif name == "paper_researcher_agent":
+                        result["paper_summaries"] = event["paper_summaries"]
+                    elif name == "blog_writer_agent":
+                        result["blog"] = event["blog"]
+                    elif name == "draft_saver_agent":
+                        result["draft_path"] = event["draft_path"]
+                    progress = min(100, progress + stage_progress.get(name, 0))
+                    set_progress(progress, f"Finished {name.replace('_', ' ')}")
+            if "draft_path" not in result:
+                raise Exception("API stream ended before the draft was saved")
+            st.session_state.result = result
+            live_preview.empty()
+            set_progress(100, "Blog generated successfully!")
+            time.sleep(1)
+            st.session_state.progress = 0
+            progress_bar.progress(st.session_state.progress)
+        except Exception as e:
+            set_progress(0, f"Error: {str(e)}")
 
     if generate_button:
-        asyncio.run(run_orchestrator())
+        run_orchestrator()
 
     if details_button:
         st.session_state.show_details = not st.session_state.show_details
@@ -243,7 +608,7 @@ def streamlit_app():
         st.session_state.status = f"Draft saved at: {draft_path}"
         st.session_state.progress = 100
         progress_bar.progress(st.session_state.progress)
-        asyncio.run(asyncio.sleep(1))
+        time.sleep(1)
         st.session_state.progress = 0
         progress_bar.progress(st.session_state.progress)
 
@@ -268,12 +633,11 @@ if platform.system() == "Emscripten":
     asyncio.ensure_future(streamlit_app())
 else:
     if __name__ == "__main__":
-        # Start FastAPI in a separate process
-        import uvicorn
+        # Start the API server (server.py, BLOG_API_WORKERS workers) in a separate process
+        import streamlit as st
         from multiprocessing import Process
-        def run_fastapi():
-            uvicorn.run(app, host="0.0.0.0", port=8000)
-        fastapi_process = Process(target=run_fastapi)
+        from server import run_server
+        fastapi_process = Process(target=run_server, kwargs={"workers": int(os.environ.get("BLOG_API_WORKERS", "1"))})
         fastapi_process.start()
         # Run Streamlit
         st.set_page_config(page_title="Blog Generator", layout="wide")
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Two-tier cache for research results: an in-memory LRU in front of a SQLite
+# table, so repeated topics skip YouTube/arXiv both within a process and
+# across restarts. Entries are keyed on the normalized topic plus the source.
+
+DEFAULT_TTLS = {
+    "youtube": float(os.environ.get("RESEARCH_CACHE_TTL_YOUTUBE", str(6 * 3600))),
+    "arxiv": float(os.environ.get("RESEARCH_CACHE_TTL_ARXIV", str(24 * 3600))),
+}
+# Results that came back incomplete (e.g. a transcript fetch timed out) are kept
+# only briefly, so one slow upstream call isn't served for a source's full TTL
+DEGRADED_TTL = float(os.environ.get("RESEARCH_CACHE_TTL_DEGRADED", "300"))
+
+def topic_key(title: str, tags: List[str]) -> str:
+    normalized_title = " ".join(title.lower().split())
+    normalized_tags = ",".join(sorted({tag.lower().strip() for tag in tags if tag.strip()}))
+    return f"{normalized_title}|{normalized_tags}"
+
+class ResearchCache:
+    def __init__(self, path: Optional[str] = "research_cache.sqlite3", max_entries: int = 256,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl: float = 3600.0,
+                 degraded_ttl: float = DEGRADED_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.degraded_ttl = degraded_ttl
+        self._memory: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "degraded": 0,
+        }
+
+    def ttl_for(self, source: str) -> float:
+        return self.ttls.get(source, self.default_ttl)
+
+    # Disk tier (blocking; always called through an executor)
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS research_cache ("
+                "source TEXT NOT NULL, topic TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (source, topic))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _disk_get(self, source: str, topic: str) -> Optional[tuple]:
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return None
+            row = db.execute(
+                "SELECT value, expires_at FROM research_cache WHERE source = ? AND topic = ?",
+                (source, topic),
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                db.execute("DELETE FROM research_cache WHERE source = ? AND topic = ?", (source, topic))
+                db.commit()
+                self.stats["expired"] += 1
+                return None
+            return json.loads(row[0]), row[1]
+
+    def _disk_set(self, source: str, topic: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return
+            db.execute(
+                "INSERT OR REPLACE INTO research_cache (source, topic, value, expires_at) VALUES (?, ?, ?, ?)",
+                (source, topic, json.dumps(value), expires_at),
+            )
+            db.commit()
+
+    def _disk_delete(self, source: Optional[str], topic: Optional[str]) -> None:
+        with self._lock:
+            db = self._db()
+            if db is None:
+                return
+            clauses, params = [], []
+            if source is not None:
+                clauses.append("source = ?")
+                params.append(source)
+            if topic is not None:
+                clauses.append("topic = ?")
+                params.append(topic)
+            where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+            db.execute(f"DELETE FROM research_cache{where}", params)
+            db.commit()
+
+    # Memory tier
+    def _memory_get(self, key: tuple) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._memory[key]
+                self.stats["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            return value
+
+    def _memory_set(self, key: tuple, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    async def get(self, source: str, topic: str) -> Optional[Any]:
+        key = (source, topic)
+        value = self._memory_get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self._disk_get, source, topic)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        value, expires_at = entry
+        self.stats["disk_hits"] += 1
+        self._memory_set(key, value, expires_at)
+        return value
+
+    async def set(self, source: str, topic: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl_for(source) if ttl is None else ttl)
+        self._memory_set((source, topic), value, expires_at)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._disk_set, source, topic, value, expires_at)
+
+    # degraded(value) marks a fetched result as incomplete; it is cached for degraded_ttl only
+    async def get_or_fetch(self, source: str, topic: str, fetch: Callable[[], Awaitable[Any]],
+                           degraded: Optional[Callable[[Any], bool]] = None) -> Any:
+        value = await self.get(source, topic)
+        if value is None:
+            value = await fetch()
+            if degraded is not None and degraded(value):
+                self.stats["degraded"] += 1
+                await self.set(source, topic, value, ttl=self.degraded_ttl)
+            else:
+                await self.set(source, topic, value)
+        return value
+
+    # Drop entries for a source, a topic, both, or everything when neither is given
+    async def invalidate(self, source: Optional[str] = None, topic: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [k for k in self._memory if (source is None or k[0] == source) and (topic is None or k[1] == topic)]:
+                del self._memory[key]
+            self.stats["invalidations"] += 1
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._disk_delete, source, topic)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._memory)
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        return {
+            **self.stats,
+            "memory_entries": size,
+            "max_entries": self.max_entries,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "ttls": self.ttls,
+            "degraded_ttl": self.degraded_ttl,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,42 @@
+import argparse
+import os
+
+# API-only entry point. Only uvicorn is imported here; the app module is loaded by
+# uvicorn itself (once per worker), and the research SDKs load on first use.
+#
+#   python server.py --workers 4
+#   BLOG_API_WORKERS=4 uvicorn server:app --workers 4   (equivalent)
+#
+# Each worker keeps its own upstream token buckets, so the YouTube/arXiv
+# per-minute quotas are divided by BLOG_API_WORKERS; run_server sets it from
+# --workers, and a bare uvicorn launch must set it to match.
+# Batch jobs run on the worker that accepted them; their progress is recorded in
+# DRAFTS_DIR/batches.sqlite3, so status and stream requests work on any worker.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP = "multi_agent_blog_system:app"
+
+def __getattr__(name):
+    # Lets `uvicorn server:app` resolve the app lazily
+    if name == "app":
+        from multi_agent_blog_system import app
+        return app
+    raise AttributeError(name)
+
+def run_server(host: str = "0.0.0.0", port: int = 8000, workers: int = 1, log_level: str = "info"):
+    import uvicorn
+    # Workers inherit the environment; the app splits its upstream quotas by this count
+    os.environ["BLOG_API_WORKERS"] = str(workers)
+    # An import string (not the app object) is required for multiple workers; each
+    # worker imports the app and runs its own lifespan startup/shutdown
+    uvicorn.run(APP, host=host, port=port, workers=workers, app_dir=APP_DIR, log_level=log_level)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blog generator API server")
+    parser.add_argument("--host", default=os.environ.get("BLOG_API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("BLOG_API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("BLOG_API_WORKERS", "1")),
+                        help="worker processes; YouTube/arXiv rate limits are split evenly between them")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    run_server(args.host, args.port, args.workers, args.log_level)
@@ -0,0 +1,102 @@
+import re
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+# Extractive summarizer: every sentence of every document in a request is scored
+# in one vectorized TF-IDF pass, then each document keeps its top sentences in
+# their original order. Cheap enough to run on every request without an LLM.
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+TOKEN = re.compile(r"[a-z0-9][a-z0-9'-]*")
+MAX_SENTENCE_WORDS = 40  # Auto-generated transcripts have no punctuation, so long runs are chunked
+MIN_SENTENCE_TOKENS = 4
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his
+how i if in into is it its itself just me more most my no nor not now of off on once only or other our out over
+own same she should so some such than that the their them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your yours
+uh um like yeah okay so gonna know really going get got thing things lot
+""".split())
+
+def split_sentences(text: str) -> List[str]:
+    sentences = []
+    for sentence in SENTENCE_SPLIT.split(" ".join(text.split())):
+        words = sentence.split()
+        for start in range(0, len(words), MAX_SENTENCE_WORDS):
+            chunk = " ".join(words[start:start + MAX_SENTENCE_WORDS])
+            if chunk:
+                sentences.append(chunk)
+    return sentences
+
+def _tokenize(sentence: str) -> List[str]:
+    return [token for token in TOKEN.findall(sentence.lower()) if token not in STOPWORDS]
+
+def _score_sentences(sentences: List[str]) -> np.ndarray:
+    vocab = {}
+    rows, cols = [], []
+    for row, sentence in enumerate(sentences):
+        for token in _tokenize(sentence):
+            rows.append(row)
+            cols.append(vocab.setdefault(token, len(vocab)))
+    if not vocab:
+        return np.zeros(len(sentences), dtype=np.float64)
+    # Token occurrences stay as (row, col) index arrays, so memory is linear in
+    # the number of tokens rather than sentences x vocabulary
+    rows = np.asarray(rows)
+    cols = np.asarray(cols)
+    n_sentences, n_terms = len(sentences), len(vocab)
+    lengths = np.bincount(rows, minlength=n_sentences).astype(np.float64)
+    pairs = np.unique(rows * n_terms + cols)
+    df = np.bincount(pairs % n_terms, minlength=n_terms)
+    idf = np.log((1.0 + n_sentences) / (1.0 + df)) + 1.0
+    # Summed tf-idf over a sentence is the sum of idf over its token occurrences;
+    # dividing by length gives the mean weight per content token
+    scores = np.bincount(rows, weights=idf[cols], minlength=n_sentences) / np.maximum(lengths, 1.0)
+    # Very short fragments are pushed to the bottom
+    scores[lengths < MIN_SENTENCE_TOKENS] *= 0.1
+    return scores
+
+def summarize_batch(documents: List[str], max_sentences: int = 3, max_chars: int = 600) -> List[str]:
+    sentences, owners = [], []
+    for doc_index, text in enumerate(documents):
+        doc_sentences = split_sentences(text)
+        sentences.extend(doc_sentences)
+        owners.extend([doc_index] * len(doc_sentences))
+    if not sentences:
+        return ["" for _ in documents]
+    scores = _score_sentences(sentences)
+    owners = np.asarray(owners)
+    summaries = []
+    for doc_index in range(len(documents)):
+        indices = np.flatnonzero(owners == doc_index)
+        if indices.size == 0:
+            summaries.append("")
+            continue
+        best = np.sort(indices[np.argsort(-scores[indices], kind="stable")[:max_sentences]])
+        summary = " ".join(sentences[i] for i in best)
+        if len(summary) > max_chars:
+            summary = summary[:max_chars].rsplit(" ", 1)[0] + "..."
+        summaries.append(summary)
+    return summaries
+
+# Per-document cost benchmark: python summarizer.py
+def benchmark(doc_counts: Tuple[int, ...] = (6, 30, 150), words_per_doc: int = 800, rounds: int = 5) -> None:
+    rng = np.random.default_rng(0)
+    words = [f"term{i}" for i in range(3000)]
+    for count in doc_counts:
+        docs = []
+        for _ in range(count):
+            picks = rng.integers(0, len(words), size=words_per_doc)
+            sentences = [" ".join(words[j] for j in picks[k:k + 16]) + "." for k in range(0, words_per_doc, 16)]
+            docs.append(" ".join(sentences))
+        started = time.perf_counter()
+        for _ in range(rounds):
+            summarize_batch(docs)
+        elapsed = (time.perf_counter() - started) / rounds
+        print(f"{count:4d} docs x {words_per_doc} words: {elapsed * 1000:8.2f} ms/batch, {elapsed / count * 1000:6.3f} ms/doc")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,36 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from batch_scheduler import BatchScheduler, BatchStore
+
+async def write_post(topic):
+    await asyncio.sleep(0.01)
+    if topic == "broken":
+        raise ValueError("no research found")
+    return {"title": topic.title()}
+
+def test_batch_is_visible_to_other_workers(tmp_path):
+    path = str(tmp_path / "batches.sqlite3")
+
+    async def scenario():
+        owner = BatchScheduler(write_post, max_concurrency=2, store=BatchStore(path, poll_interval=0.01))
+        # A second worker process: same store, no batches of its own
+        other = BatchScheduler(write_post, store=BatchStore(path, poll_interval=0.01))
+        job = await owner.submit(["rust", "broken", "go"])
+
+        seen = await other.find(job.id)
+        assert seen is not None and seen.summary()["total"] == 3
+        events = [event async for event in seen.events()]
+        assert [event["event"] for event in events] == ["topic_done"] * 3 + ["batch_done"]
+
+        final = (await other.find(job.id)).snapshot()
+        assert final["status"] == "finished"
+        assert (final["completed"], final["failed"]) == (2, 1)
+        assert final["results"][0]["result"] == {"title": "Rust"}
+        assert await other.find("missing") is None
+        owner.store.close()
+        other.store.close()
+
+    asyncio.run(scenario())
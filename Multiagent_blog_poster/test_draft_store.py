@@ -0,0 +1,30 @@
+import asyncio
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from draft_store import DraftStore
+
+def test_topic_filter_ignores_case_and_whitespace(tmp_path):
+    store = DraftStore(root=str(tmp_path))
+    asyncio.run(store.save("Ai agents", "Exploring Ai agents", "# Agents"))
+    asyncio.run(store.save("Rust", "Exploring Rust", "# Rust"))
+    for query in ("ai agents", "AI  Agents", " Ai agents "):
+        drafts = asyncio.run(store.list_drafts(topic=query))
+        assert [draft["topic"] for draft in drafts] == ["Ai agents"]
+    store.close()
+
+def test_existing_index_is_backfilled(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "index.sqlite3"))
+    conn.execute(
+        "CREATE TABLE drafts (hash TEXT PRIMARY KEY, topic TEXT NOT NULL, title TEXT NOT NULL, "
+        "path TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO drafts VALUES ('abc', 'Ai agents', 'Exploring Ai agents', '/tmp/x.md', 8, 1.0)")
+    conn.commit()
+    conn.close()
+    store = DraftStore(root=str(tmp_path))
+    drafts = asyncio.run(store.list_drafts(topic="ai agents"))
+    assert [draft["hash"] for draft in drafts] == ["abc"]
+    store.close()
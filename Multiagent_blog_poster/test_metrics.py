@@ -0,0 +1,32 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import metrics
+
+def test_cancelled_stage_is_not_an_error():
+    @metrics.instrument_stage
+    async def slow_stage():
+        await asyncio.sleep(10)
+
+    @metrics.instrument_stage
+    async def failing_stage():
+        raise ValueError("boom")
+
+    async def scenario():
+        task = asyncio.ensure_future(slow_stage())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        with pytest.raises(ValueError):
+            await failing_stage()
+
+    asyncio.run(scenario())
+    errors = metrics.stage_errors.values
+    assert (("stage", "slow_stage"),) not in errors
+    assert errors[(("stage", "failing_stage"),)] == 1
+    assert metrics.stage_in_flight.values[(("stage", "slow_stage"),)] == 0
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_gateway import LLMError, LLMGateway, _percentiles
+from stub_llm import StubChatModel, StubLLMServer
+
+# Load test for LLMGateway against the local stub LLM server. Every scenario
+# offers the same closed-loop load (--clients callers, each sending its share of
+# --requests back to back) to a fresh stub that admits --capacity concurrent
+# calls and answers the rest with 429, with a 2% heavy tail. Reports success
+# rate, throughput, end-to-end latency percentiles, server 429s and the
+# concurrency limit the gateway settled on. No network or API keys needed.
+#
+#   python common/bench_llm_gateway.py --requests 400 --clients 32 --capacity 8
+
+MESSAGES = [
+    {"role": "system", "content": "Determine if this email needs a reply. Output JSON: {'needs_reply': true/false}"},
+    {"role": "user", "content": "Subject: Invoice\nBody: Could you confirm the PO number for invoice INV-20931?"},
+]
+
+def run_sync(call, requests, clients):
+    latencies, failures = [], 0
+
+    def one(_):
+        started = time.monotonic()
+        try:
+            call(MESSAGES)
+            return time.monotonic() - started
+        except Exception:
+            return None
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(clients) as pool:
+        for latency in pool.map(one, range(requests)):
+            if latency is None:
+                failures += 1
+            else:
+                latencies.append(latency)
+    return latencies, failures, time.monotonic() - started
+
+def run_async(gateway, requests, clients):
+    async def main():
+        latencies, failures = [], 0
+        remaining = iter(range(requests))
+
+        async def client():
+            nonlocal failures
+            for _ in remaining:
+                started = time.monotonic()
+                try:
+                    await gateway.ainvoke(MESSAGES)
+                    latencies.append(time.monotonic() - started)
+                except LLMError:
+                    failures += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return latencies, failures, time.monotonic() - started
+
+    return asyncio.run(main())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--capacity", type=int, default=8, help="stub server concurrent-request limit")
+    parser.add_argument("--rpm", type=int, default=None, help="stub server requests-per-minute quota")
+    parser.add_argument("--latency", type=float, default=0.1, help="stub base latency in seconds")
+    parser.add_argument("--json", action="store_true", help="also print full gateway stats")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("direct", None, False),
+        ("gateway", {"hedge_after": None}, False),
+        ("gateway+hedge", {"hedge_after": "p95"}, False),
+        ("async+hedge", {"hedge_after": "p95"}, True),
+    ]
+    print(f"{args.requests} requests from {args.clients} clients; stub capacity {args.capacity}, "
+          f"rpm {args.rpm or 'unlimited'}, base latency {args.latency}s")
+    print(f"{'scenario':14} {'ok':>5} {'failed':>6} {'req/s':>7} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} "
+          f"{'429s':>6} {'hedges':>6} {'limit':>6}")
+    for name, settings, use_async in scenarios:
+        server = StubLLMServer(capacity=args.capacity, rpm=args.rpm, base_latency=args.latency).start()
+        model = StubChatModel(server.url)
+        gateway = None
+        if settings is None:
+            latencies, failures, elapsed = run_sync(model.invoke, args.requests, args.clients)
+        else:
+            gateway = LLMGateway(model, rpm=args.rpm, max_concurrency=args.clients, initial_concurrency=4,
+                                 max_attempts=8, base_delay=0.1, max_delay=2.0, **settings)
+            if use_async:
+                latencies, failures, elapsed = run_async(gateway, args.requests, args.clients)
+            else:
+                latencies, failures, elapsed = run_sync(gateway.invoke, args.requests, args.clients)
+        pct = _percentiles(latencies)
+        stats = gateway.stats() if gateway else None
+        print(f"{name:14} {len(latencies):5d} {failures:6d} {len(latencies) / elapsed:7.1f} {pct['p50_ms']:8} "
+              f"{pct['p95_ms']:8} {pct['p99_ms']:8} {server.stats()['throttled']:6d} "
+              f"{stats['hedges'] if stats else '-':>6} {stats['concurrency']['limit'] if stats else '-':>6}")
+        if args.json and stats:
+            print(json.dumps(stats, indent=2))
+        if gateway:
+            gateway.close()
+        server.stop()
@@ -0,0 +1,511 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# One front door for every LLM call in a process. Wraps any chat model with
+# LangChain's invoke()/ainvoke() interface and adds:
+#   - an adaptive concurrency limit (additive increase on success,
+#     multiplicative decrease on 429s) shared by sync and async callers
+#   - token buckets for requests and tokens per minute
+#   - per-attempt timeouts, also passed to the provider so a stuck call frees
+#     its slot, and retries with jittered backoff on 429/5xx
+#   - hedging: a second attempt once the first has run past the recent p95
+#     latency, if a concurrency slot is free; the first answer wins
+#   - latency and token accounting (stats())
+# Failures come back as LLMError, never as a bare provider exception.
+#
+#   llm = LLMGateway(ChatGoogleGenerativeAI(model="gemini-1.5-flash"), **gateway_settings())
+#   response = llm.invoke([SystemMessage(...), HumanMessage(...)])
+
+OK = "ok"
+THROTTLED = "throttled"
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+CHARS_PER_TOKEN = 4
+
+class LLMError(Exception):
+    def __init__(self, message, kind=FATAL, attempts=0):
+        super().__init__(message)
+        self.kind = kind
+        self.attempts = attempts
+
+# Provider SDKs raise their own timeout types (requests/httpx ReadTimeout,
+# google DeadlineExceeded) rather than TimeoutError
+def is_timeout(error):
+    name = type(error).__name__
+    return isinstance(error, TimeoutError) or "Timeout" in name or name == "DeadlineExceeded"
+
+# Sorts a provider exception into throttled / retryable / fatal without
+# importing any provider SDK: HTTP-ish status attributes first, then names
+def classify_error(error):
+    if isinstance(error, LLMError):
+        return error.kind
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)  # google.api_core exceptions carry the HTTP code here
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    status = status if isinstance(status, int) else None
+    name = type(error).__name__
+    text = str(error)
+    if status == 429 or "ResourceExhausted" in name or "RateLimit" in name or "RESOURCE_EXHAUSTED" in text or " 429" in text:
+        return THROTTLED
+    if is_timeout(error) or isinstance(error, ConnectionError) or (status is not None and status >= 500):
+        return RETRYABLE
+    if name in ("ServiceUnavailable", "InternalServerError", "ConnectionError"):
+        return RETRYABLE
+    return FATAL
+
+def retry_after(error):
+    value = getattr(error, "retry_after", None)
+    response = getattr(error, "response", None)
+    if value is None and response is not None and hasattr(response, "headers"):
+        value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def message_text(message):
+    if isinstance(message, dict):
+        return str(message.get("content", ""))
+    return str(getattr(message, "content", message))
+
+def estimate_tokens(messages):
+    if isinstance(messages, str):
+        return len(messages) // CHARS_PER_TOKEN + 1
+    return sum(len(message_text(m)) for m in messages) // CHARS_PER_TOKEN + 1
+
+# Token bucket that can go into debt: reserve() always takes the amount and
+# returns how long the caller must wait for the bucket to be back in credit,
+# so one lock round trip serves both sync and async callers
+class RateLimiter:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else max(1.0, per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.waits = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, amount=1.0):
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            self.waits += 1
+            return -self.tokens / self.rate
+
+    # Takes the amount only if that leaves the bucket in credit
+    def try_take(self, amount=1.0):
+        with self.lock:
+            self._refill()
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+
+    # Give back (positive) or charge more (negative) once the real cost is known
+    def adjust(self, amount):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def snapshot(self):
+        with self.lock:
+            self._refill()
+            return {"per_minute": round(self.rate * 60), "available": round(self.tokens, 1), "waits": self.waits}
+
+# AIMD concurrency limit. Successes raise the limit by about one per limit's
+# worth of calls; a 429 halves it, at most once per cooldown so one burst of
+# rejections counts as a single congestion signal. Sync waiters block on a
+# condition, async waiters on futures resolved from whichever thread releases.
+class AdaptiveLimiter:
+    def __init__(self, initial=4, min_limit=1, max_limit=32, decrease=0.5, cooldown=0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.async_waiters = deque()  # (loop, future)
+        self.last_decrease = 0.0
+        self.counts = {"increases": 0, "decreases": 0}
+
+    def _available(self):
+        return self.in_flight < max(self.min_limit, int(self.limit))
+
+    def try_acquire(self):
+        with self.cond:
+            if not self._available():
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        with self.cond:
+            self.cond.wait_for(self._available)
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.cond:
+                if self._available():
+                    self.in_flight += 1
+                    return
+                future = loop.create_future()
+                self.async_waiters.append((loop, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self.cond:
+                    try:
+                        self.async_waiters.remove((loop, future))
+                    except ValueError:
+                        self._wake()  # We were already woken; pass the slot on
+                raise
+
+    def release(self, outcome=OK):
+        with self.cond:
+            self.in_flight -= 1
+            if outcome == OK and self.limit < self.max_limit:
+                previous = int(self.limit)
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                self.counts["increases"] += int(self.limit) > previous
+            elif outcome == THROTTLED:
+                now = time.monotonic()
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self.last_decrease = now
+                    self.counts["decreases"] += 1
+            self._wake()
+
+    def _wake(self):
+        free = max(self.min_limit, int(self.limit)) - self.in_flight
+        if free <= 0:
+            return
+        self.cond.notify(free)
+        while free > 0 and self.async_waiters:
+            loop, future = self.async_waiters.popleft()
+            loop.call_soon_threadsafe(_resolve, future)
+            free -= 1
+
+    def snapshot(self):
+        with self.cond:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight,
+                    "waiting_async": len(self.async_waiters), **self.counts}
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+def _percentiles(values):
+    values = sorted(values)
+    stats = {}
+    for pct in (50, 95, 99):
+        stats[f"p{pct}_ms"] = round(values[min(len(values) - 1, len(values) * pct // 100)] * 1000, 1) if values else None
+    stats["max_ms"] = round(values[-1] * 1000, 1) if values else None
+    return stats
+
+class LLMGateway:
+    def __init__(self, llm, rpm=None, tpm=None, max_concurrency=16, initial_concurrency=4, min_concurrency=1,
+                 timeout=60.0, max_attempts=3, base_delay=0.5, max_delay=20.0, hedge_after="p95",
+                 hedge_min_delay=0.25, hedge_min_samples=20, expected_output_tokens=256,
+                 latency_samples=1000, name="llm", timeout_kwarg="timeout"):
+        self.llm = llm
+        self.name = name
+        self.timeout = timeout
+        self.timeout_kwarg = timeout_kwarg  # invoke() keyword for the provider's own timeout; None to not pass one
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after  # seconds, "p95" (adaptive) or None
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.expected_output_tokens = expected_output_tokens
+        self.limiter = AdaptiveLimiter(initial=min(initial_concurrency, max_concurrency),
+                                       min_limit=min_concurrency, max_limit=max_concurrency)
+        self.rpm = RateLimiter(rpm) if rpm else None
+        self.tpm = RateLimiter(tpm) if tpm else None
+        # Attempts hold a limiter slot until they really finish, so the pool
+        # never needs more threads than the concurrency ceiling
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency + 1, thread_name_prefix=f"{name}-call")
+        self.lock = threading.Lock()
+        self.attempt_latencies = deque(maxlen=latency_samples)
+        self.call_latencies = deque(maxlen=latency_samples)
+        self.counts = {
+            "calls": 0, "succeeded": 0, "failed": 0, "attempts": 0, "retries": 0, "throttled": 0,
+            "timeouts": 0, "hedges": 0, "hedge_wins": 0, "input_tokens": 0, "output_tokens": 0,
+        }
+
+    # Quota
+
+    def _reserve_quota(self, estimate):
+        delay = 0.0
+        if self.rpm is not None:
+            delay = max(delay, self.rpm.reserve(1))
+        if self.tpm is not None:
+            delay = max(delay, self.tpm.reserve(estimate))
+        return delay
+
+    def _try_quota(self, estimate):
+        if self.rpm is not None and not self.rpm.try_take(1):
+            return False
+        if self.tpm is not None and not self.tpm.try_take(estimate):
+            if self.rpm is not None:
+                self.rpm.adjust(1)
+            return False
+        return True
+
+    def _hedge_delay(self):
+        if self.hedge_after is None:
+            return None
+        if self.hedge_after != "p95":
+            return float(self.hedge_after)
+        with self.lock:
+            if len(self.attempt_latencies) < self.hedge_min_samples:
+                return None
+            latencies = sorted(self.attempt_latencies)
+        return max(self.hedge_min_delay, latencies[len(latencies) * 95 // 100])
+
+    def _backoff(self, attempt, error):
+        delay = retry_after(error)
+        if delay is not None:
+            # Spread callers told the same Retry-After so they don't return in lockstep
+            return min(self.max_delay, delay * random.uniform(1.0, 1.5))
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    # Accounting for one finished attempt (winner, loser or failure); frees its slot
+    def _attempt_done(self, started, estimate, response=None, error=None):
+        kind = OK if error is None else classify_error(error)
+        self.limiter.release(kind)
+        with self.lock:
+            self.counts["attempts"] += 1
+            if kind == THROTTLED:
+                self.counts["throttled"] += 1
+            if response is None:
+                return
+            self.attempt_latencies.append(time.monotonic() - started)
+            usage = getattr(response, "usage_metadata", None) or {}
+            input_tokens = usage.get("input_tokens") or estimate - self.expected_output_tokens
+            output_tokens = usage.get("output_tokens") or len(message_text(response)) // CHARS_PER_TOKEN
+            self.counts["input_tokens"] += input_tokens
+            self.counts["output_tokens"] += output_tokens
+        if self.tpm is not None:
+            self.tpm.adjust(estimate - input_tokens - output_tokens)
+
+    def _finish_call(self, started, succeeded, hedged_win=False):
+        with self.lock:
+            self.counts["succeeded" if succeeded else "failed"] += 1
+            self.counts["hedge_wins"] += hedged_win
+            if succeeded:
+                self.call_latencies.append(time.monotonic() - started)
+
+    def _give_up(self, error, attempt):
+        kind = classify_error(error)
+        return LLMError(f"{self.name} call failed after {attempt} attempt(s) ({kind}): {error}", kind, attempt)
+
+    # Caller's kwargs plus the time left until `deadline` as the provider timeout
+    def _call_kwargs(self, kwargs, deadline, now):
+        if self.timeout_kwarg is None or self.timeout_kwarg in kwargs:
+            return kwargs
+        return {**kwargs, self.timeout_kwarg: max(0.001, deadline - now)}
+
+    def _count_timeout(self):
+        with self.lock:
+            self.counts["timeouts"] += 1
+
+    # Sync entry point
+
+    # Runs one attempt on the pool; the caller has already taken its limiter slot
+    def _submit(self, messages, kwargs, estimate, deadline):
+        started = time.monotonic()
+        call_kwargs = self._call_kwargs(kwargs, deadline, started)
+
+        def run():
+            try:
+                response = self.llm.invoke(messages, **call_kwargs)
+            except BaseException as error:
+                self._attempt_done(started, estimate, error=error)
+                raise
+            self._attempt_done(started, estimate, response=response)
+            return response
+
+        try:
+            return self.executor.submit(run)
+        except BaseException:
+            # Pool shut down (close()): run() never starts, so free the slot here
+            self.limiter.release(None)
+            raise
+
+    def _attempt(self, messages, kwargs, estimate):
+        deadline = time.monotonic() + self.timeout
+        futures = [self._submit(messages, kwargs, estimate, deadline)]
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < self.timeout:
+            done, _ = wait(futures, timeout=hedge_delay)
+            # Hedge only with a spare slot and quota, so hedging never adds to an overload
+            if not done and self.limiter.try_acquire():
+                if self._try_quota(estimate):
+                    futures.append(self._submit(messages, kwargs, estimate, deadline))
+                    with self.lock:
+                        self.counts["hedges"] += 1
+                else:
+                    self.limiter.release(None)
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"no response within {self.timeout}s")
+            for future in done:
+                if future.exception() is None:
+                    return future.result(), future is not futures[0]
+                error = error or future.exception()
+        raise error
+
+    def invoke(self, messages, **kwargs):
+        started = time.monotonic()
+        estimate = estimate_tokens(messages) + self.expected_output_tokens
+        with self.lock:
+            self.counts["calls"] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self._reserve_quota(estimate)
+            if delay > 0:
+                time.sleep(delay)
+            self.limiter.acquire()
+            try:
+                response, hedge_won = self._attempt(messages, kwargs, estimate)
+            except Exception as error:
+                # Counted once per attempt, whether the gateway or the provider timed out
+                if is_timeout(error):
+                    self._count_timeout()
+                if classify_error(error) == FATAL or attempt == self.max_attempts:
+                    self._finish_call(started, False)
+                    raise self._give_up(error, attempt) from error
+                with self.lock:
+                    self.counts["retries"] += 1
+                time.sleep(self._backoff(attempt, error))
+                continue
+            self._finish_call(started, True, hedge_won)
+            return response
+
+    # Async entry point
+
+    def _start_async(self, messages, kwargs, estimate, deadline):
+        started = time.monotonic()
+        call_kwargs = self._call_kwargs(kwargs, deadline, started)
+
+        async def run():
+            try:
+                if hasattr(self.llm, "ainvoke"):
+                    response = await self.llm.ainvoke(messages, **call_kwargs)
+                else:
+                    loop = asyncio.get_running_loop()
+                    response = await loop.run_in_executor(self.executor, lambda: self.llm.invoke(messages, **call_kwargs))
+            except BaseException as error:
+                self._attempt_done(started, estimate, error=error)
+                raise
+            self._attempt_done(started, estimate, response=response)
+            return response
+
+        return asyncio.ensure_future(run())
+
+    async def _attempt_async(self, messages, kwargs, estimate):
+        deadline = time.monotonic() + self.timeout
+        tasks = [self._start_async(messages, kwargs, estimate, deadline)]
+        hedge_delay = self._hedge_delay()
+        try:
+            if hedge_delay is not None and hedge_delay < self.timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done and self.limiter.try_acquire():
+                    if self._try_quota(estimate):
+                        tasks.append(self._start_async(messages, kwargs, estimate, deadline))
+                        with self.lock:
+                            self.counts["hedges"] += 1
+                    else:
+                        self.limiter.release(None)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise TimeoutError(f"no response within {self.timeout}s")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), task is not tasks[0]
+                    error = error or task.exception()
+            raise error
+        finally:
+            # Losers and timed-out attempts are cancelled; their slots free on cancellation
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def ainvoke(self, messages, **kwargs):
+        started = time.monotonic()
+        estimate = estimate_tokens(messages) + self.expected_output_tokens
+        with self.lock:
+            self.counts["calls"] += 1
+        for attempt in range(1, self.max_attempts + 1):
+            delay = self._reserve_quota(estimate)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.limiter.acquire_async()
+            try:
+                response, hedge_won = await self._attempt_async(messages, kwargs, estimate)
+            except Exception as error:
+                if is_timeout(error):
+                    self._count_timeout()
+                if classify_error(error) == FATAL or attempt == self.max_attempts:
+                    self._finish_call(started, False)
+                    raise self._give_up(error, attempt) from error
+                with self.lock:
+                    self.counts["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt, error))
+                continue
+            self._finish_call(started, True, hedge_won)
+            return response
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+            call_latencies = list(self.call_latencies)
+        stats["latency"] = _percentiles(call_latencies)
+        stats["concurrency"] = self.limiter.snapshot()
+        stats["rpm"] = self.rpm.snapshot() if self.rpm else None
+        stats["tpm"] = self.tpm.snapshot() if self.tpm else None
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# Gateway keyword arguments from LLM_* environment variables, for the agents
+def gateway_settings(prefix="LLM_"):
+    def env(name, cast, default):
+        value = os.environ.get(prefix + name)
+        return cast(value) if value not in (None, "") else default
+
+    hedge = os.environ.get(prefix + "HEDGE_AFTER", "p95")
+    return {
+        "rpm": env("RPM", float, None),  # Requests per minute; unset means unlimited
+        "tpm": env("TPM", float, None),  # Tokens per minute; unset means unlimited
+        "max_concurrency": env("MAX_CONCURRENCY", int, 16),
+        "initial_concurrency": env("INITIAL_CONCURRENCY", int, 4),
+        "timeout": env("TIMEOUT", float, 60.0),
+        "max_attempts": env("MAX_ATTEMPTS", int, 3),
+        "hedge_after": None if hedge in ("", "off", "none") else hedge if hedge == "p95" else float(hedge),
+    }
@@ -0,0 +1,29 @@
+import json
+import re
+
+# Lenient parsing for the small JSON objects the agents ask their LLMs for.
+# Models often wrap JSON in code fences, add prose around it or use single
+# quotes; dig the object out instead of giving up on the first json.loads error.
+
+def parse_llm_json(content: str):
+    text = re.sub(r"^```(?:json)?|```$", "", content.strip(), flags=re.MULTILINE).strip()
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    candidate = text[start:end + 1]
+    for attempt in (candidate, re.sub(r"'([^']*)'\s*:", r'"\1":', candidate)):
+        try:
+            result = json.loads(attempt)
+            if isinstance(result, dict):
+                return result
+        except ValueError:
+            pass
+    match = re.search(r"needs_reply['\"]?\s*:\s*['\"]?(true|false)", candidate, re.IGNORECASE)
+    if match:
+        return {"needs_reply": match.group(1).lower() == "true"}
+    return None
+
+def as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "1")
+    return bool(value)
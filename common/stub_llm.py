@@ -0,0 +1,186 @@
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Local stand-in for a hosted chat model, for load tests and offline runs.
+# The server models what matters for client-side flow control: latency that
+# grows with prompt and output size, a heavy tail (a small share of calls run
+# many times slower), a cap on concurrent requests and a requests-per-minute
+# quota, both answered with 429 + Retry-After. StubChatModel is a client with
+# the LangChain invoke() shape, so it can sit behind LLMGateway or replace the
+# Gemini model in the agents (LLM_STUB_URL).
+#
+#   python common/stub_llm.py --port 8089 --capacity 8 --rpm 1200
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.server.config
+        admitted, retry_after = self.server.admit()
+        if not admitted:
+            self._reply(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                        {"Retry-After": f"{retry_after:.2f}"})
+            return
+        try:
+            messages = request.get("messages", [])
+            content = stub_completion(messages)
+            input_tokens = sum(len(m.get("content", "")) for m in messages) // 4 + 1
+            output_tokens = len(content) // 4 + 1
+            latency = (config["base_latency"] + input_tokens * config["per_input_token"]
+                       + output_tokens * config["per_output_token"]) * random.lognormvariate(0, config["jitter"])
+            if random.random() < config["tail_probability"]:
+                latency *= config["tail_factor"]
+            time.sleep(latency)
+            self._reply(200, {"content": content, "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens}})
+        finally:
+            self.server.finish()
+
+    def _reply(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+# Canned answers shaped like what the agents' prompts ask for
+def stub_completion(messages):
+    system = messages[0].get("content", "") if messages else ""
+    user = messages[-1].get("content", "") if messages else ""
+    needs_reply = "?" in user or len(user.split()) > 8
+    reply = "Hello,\nThanks for reaching out, I'll look into this and get back to you.\nBest regards,"
+    if "needs_reply" in system and "reply" in system.split("needs_reply", 1)[1]:
+        return json.dumps({"needs_reply": needs_reply, "reply": reply if needs_reply else ""})
+    if "needs_reply" in system:
+        return json.dumps({"needs_reply": needs_reply})
+    return reply
+
+class StubLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, capacity=8, rpm=None, base_latency=0.2,
+                 per_input_token=0.0002, per_output_token=0.004, jitter=0.2,
+                 tail_probability=0.02, tail_factor=8.0):
+        super().__init__((host, port), StubLLMHandler)
+        self.config = {
+            "capacity": capacity, "rpm": rpm, "base_latency": base_latency,
+            "per_input_token": per_input_token, "per_output_token": per_output_token,
+            "jitter": jitter, "tail_probability": tail_probability, "tail_factor": tail_factor,
+        }
+        self.lock = threading.Lock()
+        self.active = 0
+        self.recent = deque()  # admission times in the last minute
+        self.counts = {"requests": 0, "served": 0, "throttled": 0, "max_active": 0}
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def admit(self):
+        now = time.monotonic()
+        with self.lock:
+            self.counts["requests"] += 1
+            while self.recent and self.recent[0] <= now - 60:
+                self.recent.popleft()
+            rpm = self.config["rpm"]
+            if rpm and len(self.recent) >= rpm:
+                self.counts["throttled"] += 1
+                return False, self.recent[0] + 60 - now
+            if self.active >= self.config["capacity"]:
+                self.counts["throttled"] += 1
+                return False, 0.5
+            self.active += 1
+            self.recent.append(now)
+            self.counts["max_active"] = max(self.counts["max_active"], self.active)
+            return True, 0.0
+
+    def finish(self):
+        with self.lock:
+            self.active -= 1
+            self.counts["served"] += 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="stub-llm", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+class StubLLMError(Exception):
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class StubMessage:
+    def __init__(self, content, usage_metadata):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+# Client with the subset of the LangChain chat model interface the agents use
+class StubChatModel:
+    def __init__(self, base_url, timeout=120.0):
+        self.url = base_url.rstrip("/") + "/v1/chat"
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def invoke(self, messages, **kwargs):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        payload = {"messages": [
+            m if isinstance(m, dict) else {"role": getattr(m, "type", "user"), "content": m.content}
+            for m in messages
+        ]}
+        # A per-call timeout (the gateway passes the attempt's remaining time) overrides the default
+        response = self._session().post(self.url, json=payload, timeout=kwargs.get("timeout", self.timeout))
+        if response.status_code != 200:
+            header = response.headers.get("Retry-After")
+            raise StubLLMError(response.status_code, response.text[:200], float(header) if header else None)
+        body = response.json()
+        return StubMessage(body["content"], body["usage"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent requests before 429s")
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute before 429s")
+    parser.add_argument("--latency", type=float, default=0.2, help="base seconds per call")
+    parser.add_argument("--tail-probability", type=float, default=0.02)
+    parser.add_argument("--tail-factor", type=float, default=8.0)
+    args = parser.parse_args()
+    server = StubLLMServer(args.host, args.port, capacity=args.capacity, rpm=args.rpm, base_latency=args.latency,
+                           tail_probability=args.tail_probability, tail_factor=args.tail_factor)
+    print(f"Stub LLM listening on {server.url}/v1/chat")
+    server.serve_forever()
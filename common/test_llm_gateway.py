@@ -0,0 +1,148 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from llm_gateway import (FATAL, OK, RETRYABLE, THROTTLED, AdaptiveLimiter, LLMError, LLMGateway, RateLimiter,
+                         classify_error)
+
+class Reply:
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class ReadTimeout(Exception):
+    pass
+
+# Chat model whose n-th call runs script[n] (the last entry repeats): an
+# exception to raise, a number of seconds to sleep before answering, or a reply
+class ScriptedModel:
+    def __init__(self, *script):
+        self.script = script
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def invoke(self, messages, **kwargs):
+        with self.lock:
+            step = self.script[min(len(self.calls), len(self.script) - 1)]
+            self.calls.append(kwargs)
+        if isinstance(step, BaseException):
+            raise step
+        if isinstance(step, (int, float)):
+            time.sleep(step)
+            return Reply("slow")
+        return step
+
+def gateway(model, **kwargs):
+    settings = {"base_delay": 0.0, "hedge_after": None, "timeout": 5.0}
+    settings.update(kwargs)
+    return LLMGateway(model, **settings)
+
+@pytest.mark.parametrize("error, kind", [
+    (HTTPError(429), THROTTLED),
+    (Exception("429 RESOURCE_EXHAUSTED: quota"), THROTTLED),
+    (HTTPError(503), RETRYABLE),
+    (TimeoutError("slow"), RETRYABLE),
+    (ReadTimeout("read timed out"), RETRYABLE),
+    (ConnectionResetError(), RETRYABLE),
+    (HTTPError(400), FATAL),
+    (ValueError("bad request"), FATAL),
+    (LLMError("given up", RETRYABLE), RETRYABLE),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+def test_adaptive_limiter_grows_additively_and_halves_on_throttle():
+    limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=8, cooldown=60)
+    for _ in range(4):
+        assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    for _ in range(4):
+        limiter.release(OK)
+    assert 4.9 < limiter.limit < 5.0  # ~ +1 per limit's worth of successes
+    grown = limiter.limit
+    limiter.try_acquire()
+    limiter.release(THROTTLED)
+    assert limiter.limit == pytest.approx(grown / 2)
+    # A second 429 within the cooldown is the same congestion event
+    before = limiter.limit
+    limiter.try_acquire()
+    limiter.release(THROTTLED)
+    assert limiter.limit == before and limiter.counts["decreases"] == 1
+
+def test_rate_limiter_goes_into_debt():
+    bucket = RateLimiter(per_minute=60, burst=2)
+    assert bucket.reserve() == 0.0 and bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)  # one token per second
+    assert not bucket.try_take()
+    bucket.adjust(5)
+    assert bucket.tokens <= bucket.capacity
+
+def test_token_budget_is_settled_with_reported_usage():
+    model = ScriptedModel(Reply("ok", {"input_tokens": 10, "output_tokens": 5}))
+    llm = gateway(model, rpm=600, tpm=6000, expected_output_tokens=100)
+    llm.invoke("hello")
+    # The estimate is reserved up front, and the unused part handed back
+    assert llm.tpm.tokens == pytest.approx(llm.tpm.capacity - 15, abs=1)
+    assert llm.rpm.tokens == pytest.approx(llm.rpm.capacity - 1, abs=0.1)
+    assert (llm.counts["input_tokens"], llm.counts["output_tokens"]) == (10, 5)
+    llm.close()
+
+def test_retryable_errors_are_retried_and_fatal_ones_are_not():
+    llm = gateway(ScriptedModel(HTTPError(503), HTTPError(429), Reply("ok")), max_attempts=3)
+    assert llm.invoke("hi").content == "ok"
+    assert (llm.counts["attempts"], llm.counts["retries"], llm.counts["throttled"]) == (3, 2, 1)
+
+    llm = gateway(ScriptedModel(ValueError("bad request"), Reply("ok")), max_attempts=3)
+    with pytest.raises(LLMError) as excinfo:
+        llm.invoke("hi")
+    assert excinfo.value.kind == FATAL and excinfo.value.attempts == 1
+    assert llm.stats()["concurrency"]["in_flight"] == 0
+
+def test_timeouts_are_counted_once_per_attempt():
+    llm = gateway(ScriptedModel(TimeoutError("provider timed out")), max_attempts=2)
+    with pytest.raises(LLMError):
+        llm.invoke("hi")
+    assert (llm.counts["attempts"], llm.counts["timeouts"]) == (2, 2)
+
+    async def call():
+        with pytest.raises(LLMError):
+            await llm.ainvoke("hi")
+
+    asyncio.run(call())
+    assert (llm.counts["attempts"], llm.counts["timeouts"]) == (4, 4)
+
+def test_provider_gets_the_remaining_attempt_time():
+    model = ScriptedModel(Reply("ok"))
+    llm = gateway(model, timeout=2.0)
+    llm.invoke("hi")
+    llm.invoke("hi", timeout=7)
+    assert 0 < model.calls[0]["timeout"] <= 2.0
+    assert model.calls[1]["timeout"] == 7  # an explicit timeout wins
+    gateway(model, timeout_kwarg=None).invoke("hi")
+    assert "timeout" not in model.calls[2]
+
+def test_slow_attempt_is_hedged():
+    llm = gateway(ScriptedModel(1.0, Reply("fast")), hedge_after=0.05, initial_concurrency=2)
+    started = time.monotonic()
+    assert llm.invoke("hi").content == "fast"
+    assert time.monotonic() - started < 0.9
+    assert (llm.counts["hedges"], llm.counts["hedge_wins"]) == (1, 1)
+    llm.close()
+
+def test_closed_gateway_does_not_leak_slots():
+    llm = gateway(ScriptedModel(Reply("ok")), initial_concurrency=1)
+    llm.close()
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            llm.invoke("hi")
+    assert llm.stats()["concurrency"]["in_flight"] == 0
@@ -1,9 +1,24 @@
 import os
-import json
-import requests
-from flask import Flask, request
+import sys
+import time
+import atexit
+import signal
+import threading
+from collections import deque
+from flask import Flask, request, jsonify
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from worker_pool import WorkerPool
+from dedup_store import DedupStore
+from sender import WhatsAppSender
+from coalescer import BurstCoalescer
+from reply_cache import ReplyCache
+
+# Shared LLM gateway lives in ../common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.llm_gateway import FATAL, LLMError, LLMGateway, gateway_settings  # noqa: E402
+from common.llm_json import as_bool, parse_llm_json  # noqa: E402
+from common.stub_llm import StubChatModel  # noqa: E402
 
 # Configuration
 os.environ["GOOGLE_API_KEY"] = "YOUR_GEMINI_API_KEY"  # Replace with your Gemini API key
@@ -11,10 +26,49 @@ META_ACCESS_TOKEN = "YOUR_META_ACCESS_TOKEN"  # From Meta App Dashboard
 PHONE_NUMBER_ID = "YOUR_PHONE_NUMBER_ID"  # From Meta App Dashboard
 VERIFY_TOKEN = "YOUR_VERIFY_TOKEN"  # Choose a secure string
 VERSION = "v18.0"  # Meta Graph API version
+GRAPH_API_BASE = os.environ.get("GRAPH_API_BASE", "https://graph.facebook.com")  # Point at a local stub for testing
+SEND_RATE_PER_SECOND = float(os.environ.get("SEND_RATE_PER_SECOND", "20"))  # Per PHONE_NUMBER_ID
+SEND_MAX_ATTEMPTS = int(os.environ.get("SEND_MAX_ATTEMPTS", "5"))
+REPLY_WORKERS = int(os.environ.get("REPLY_WORKERS", "4"))  # Threads running the LLM + send pipeline
+REPLY_QUEUE_SIZE = int(os.environ.get("REPLY_QUEUE_SIZE", "1000"))  # Pending messages before the webhook pushes back
+REPLY_MODE = os.environ.get("REPLY_MODE", "combined")  # "combined" (one LLM call) or "two_step" (assess, then generate)
+COALESCE_WINDOW = float(os.environ.get("COALESCE_WINDOW", "2.0"))  # Quiet seconds that end a sender's burst; 0 disables
+COALESCE_MAX_WAIT = float(os.environ.get("COALESCE_MAX_WAIT", "10.0"))  # Longest a burst is held back
+REPLY_RETRY_ATTEMPTS = int(os.environ.get("REPLY_RETRY_ATTEMPTS", "3"))  # Drafting tries per message while the LLM fails
+REPLY_RETRY_DELAY = float(os.environ.get("REPLY_RETRY_DELAY", "30"))  # Seconds before the first re-try; doubles each time
+REPLY_CACHE_SIZE = int(os.environ.get("REPLY_CACHE_SIZE", "1000"))  # Cached replies for repeated messages
+REPLY_CACHE_TTL = float(os.environ.get("REPLY_CACHE_TTL", str(6 * 3600)))
+DEDUP_MAX_IDS = int(os.environ.get("DEDUP_MAX_IDS", "10000"))  # Message ids remembered in memory
+DEDUP_TTL = float(os.environ.get("DEDUP_TTL", str(24 * 3600)))  # Seconds a message id is remembered
+DEDUP_DB = os.environ.get("DEDUP_DB", "processed_messages.sqlite3")  # Set to "" to keep ids in memory only
 
 # Initialize Flask app and Gemini
 app = Flask(__name__)
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash")
+# Every LLM call goes through the gateway: adaptive concurrency, RPM/TPM limits,
+# retries and hedging (LLM_* env vars). LLM_STUB_URL swaps Gemini for the local stub.
+chat_model = (StubChatModel(os.environ["LLM_STUB_URL"]) if os.environ.get("LLM_STUB_URL")
+              else ChatGoogleGenerativeAI(model="gemini-1.5-flash"))
+llm = LLMGateway(chat_model, name="whatsapp-llm", **gateway_settings())
+
+# Ids of queued and handled messages; Meta retries deliveries, and a retried
+# message must not be assessed, drafted or replied to twice
+dedup = DedupStore(max_entries=DEDUP_MAX_IDS, ttl=DEDUP_TTL, path=DEDUP_DB or None)
+
+# Replies for word-for-word repeat messages
+reply_cache = ReplyCache(max_entries=REPLY_CACHE_SIZE, ttl=REPLY_CACHE_TTL)
+
+# Messages given up on because the LLM kept failing (or failed permanently)
+failed_replies = deque(maxlen=1000)
+
+# Pooled, rate-limited Graph API client with background retries and dead-lettering
+sender = WhatsAppSender(
+    META_ACCESS_TOKEN,
+    base_url=GRAPH_API_BASE,
+    version=VERSION,
+    rate_per_second=SEND_RATE_PER_SECOND,
+    burst=SEND_RATE_PER_SECOND,
+    max_attempts=SEND_MAX_ATTEMPTS,
+)
 
 # Webhook verification endpoint
 @app.route("/webhook", methods=["GET"])
@@ -26,7 +80,8 @@ def verify_webhook():
         return request.args.get("hub.challenge"), 200
     return "Verification failed", 403
 
-# Webhook endpoint to receive messages
+# Webhook endpoint to receive messages. It only parses and enqueues, so Meta gets
+# its 200 right away; replies are produced by the worker pool below.
 @app.route("/webhook", methods=["POST"])
 def webhook():
     data = request.get_json()
@@ -40,48 +95,151 @@ def webhook():
             for message in change["value"].get("messages", []):
                 if message["type"] != "text":
                     continue
-                sender = message["from"]
-                message_text = message["text"]["body"]
-                message_id = message["id"]
-
-                # Assess if reply is needed
-                needs_reply = assess_reply(message_text)
-                if not needs_reply:
+                if not dedup.claim(message["id"]):
                     continue
-
-                # Generate reply
-                reply = generate_reply(message_text)
-                if reply:
-                    send_reply(sender, reply, message_id)
+                job = {
+                    "sender": message["from"],
+                    "text": message["text"]["body"],
+                    "message_id": message["id"],
+                    "message_ids": [message["id"]],
+                }
+                if not enqueue_message(job):
+                    # Queue full (or shutting down): ask Meta to redeliver later
+                    dedup.release(message["id"])
+                    return "", 503
     return "", 200
 
+# Queue depth, throughput and latency of the reply workers
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify({
+        "workers": reply_pool.stats(),
+        "dedup": dedup.stats(),
+        "sender": sender.stats(),
+        "coalescer": coalescer.stats() if coalescer else None,
+        "reply_cache": reply_cache.stats(),
+        "failed_replies": len(failed_replies),
+        "llm": llm.stats() if isinstance(llm, LLMGateway) else None,
+    })
+
+# With coalescing on, messages wait in the sender's burst buffer and reach the
+# worker pool as one job when the sender goes quiet. Buffered messages count
+# against the queue size so the webhook answers 503 before anything would have
+# to be dropped after Meta got its 200.
+def enqueue_message(job: dict) -> bool:
+    if coalescer is None:
+        return reply_pool.submit(job)
+    if not reply_pool.has_capacity(reserved=coalescer.pending()):
+        return False
+    coalescer.add(job["sender"], job)
+    return True
+
+def flush_burst(sender_id: str, jobs: list):
+    merged = {
+        "sender": sender_id,
+        "text": "\n".join(job["text"] for job in jobs),
+        "message_id": jobs[-1]["message_id"],  # Reply in context of the latest message
+        "message_ids": [mid for job in jobs for mid in job["message_ids"]],
+    }
+    # Capacity was reserved at enqueue time, so wait for a slot rather than drop
+    # the burst; submit only fails once the pool has stopped accepting
+    if not reply_pool.submit(merged, timeout=None):
+        print(f"Dropped {len(jobs)} message(s) from {sender_id}: reply pool stopped")
+        for message_id in merged["message_ids"]:
+            dedup.complete(message_id)
+
+def process_message(job: dict):
+    done = True
+    try:
+        hit, reply = reply_cache.get(job["text"])
+        if not hit:
+            try:
+                reply = draft_reply(job["text"])
+            except LLMError as e:
+                # Nothing is sent or cached without a verdict from the LLM; the
+                # message stays claimed while it waits for another try
+                done = not retry_later(job, e)
+                return
+            reply_cache.put(job["text"], reply)
+        if reply:
+            send_reply(job["sender"], reply, job["message_id"])
+    finally:
+        if done:
+            for message_id in job["message_ids"]:
+                dedup.complete(message_id)
+
+# Re-queues a job whose drafting hit an LLM outage, with exponential delay.
+# Returns False once the job is given up on: a fatal error or out of attempts.
+def retry_later(job: dict, error: LLMError) -> bool:
+    attempt = job.get("llm_attempts", 0) + 1
+    if error.kind == FATAL or attempt >= REPLY_RETRY_ATTEMPTS:
+        print(f"Gave up on message {job['message_id']} after {attempt} attempt(s): {error}")
+        failed_replies.append({**job, "error": str(error), "failed_at": time.time()})
+        return False
+    delay = REPLY_RETRY_DELAY * 2 ** (attempt - 1)
+    print(f"Reply drafting failed, retrying in {delay:g}s: {error}")
+    timer = threading.Timer(delay, resubmit, args=({**job, "llm_attempts": attempt},))
+    timer.daemon = True
+    timer.start()
+    return True
+
+def resubmit(job: dict):
+    if not reply_pool.submit(job, timeout=None):
+        print(f"Dropped message {job['message_id']}: reply pool stopped")
+        for message_id in job["message_ids"]:
+            dedup.complete(message_id)
+
+# Returns the reply to send, or None when the message needs no reply.
+# Raises LLMError when the LLM can't be reached, so the caller can tell an
+# outage from a "no reply" verdict.
+def draft_reply(message_text: str):
+    if REPLY_MODE == "combined":
+        decision = triage_and_draft(message_text)
+        if decision is not None:
+            needs_reply, reply = decision
+            if not needs_reply:
+                return None
+            # A "yes" without a usable draft still gets one from the reply prompt
+            return reply or generate_reply(message_text)
+
+    # Two-step path, also the fallback when the combined output is unusable
+    if not assess_reply(message_text):
+        return None
+    return generate_reply(message_text)
+
 def assess_reply(message_text: str) -> bool:
     prompt = SystemMessage(content="Determine if this WhatsApp message needs a reply. Output JSON: {'needs_reply': true/false}")
     user_msg = HumanMessage(content=f"Message: {message_text}")
-    try:
-        response = llm.invoke([prompt, user_msg])
-        result = json.loads(response.content)
-        return result.get("needs_reply", False)
-    except:
-        return False
+    response = llm.invoke([prompt, user_msg])
+    result = parse_llm_json(response.content)
+    return as_bool(result.get("needs_reply", False)) if result else False
+
+# One call that both triages and drafts. Returns (needs_reply, reply), or None
+# if the output can't be parsed so the caller can fall back to the two-step path.
+# LLMError propagates: retrying with two more calls won't help during an outage.
+def triage_and_draft(message_text: str):
+    prompt = SystemMessage(content=(
+        "Triage and draft a WhatsApp reply. If one is needed, write it friendly, professional and under 200 "
+        "characters if possible; answer questions, or use '[YOUR_ANSWER_HERE]' if unknown. "
+        'Output only JSON: {"needs_reply": true/false, "reply": "<text, empty if none>"}'
+    ))
+    user_msg = HumanMessage(content=f"Message: {message_text}")
+    response = llm.invoke([prompt, user_msg])
+    result = parse_llm_json(response.content)
+    if result is None or "needs_reply" not in result:
+        return None
+    reply = result.get("reply")
+    return as_bool(result["needs_reply"]), reply.strip() if isinstance(reply, str) else ""
 
 def generate_reply(message_text: str) -> str:
     prompt = SystemMessage(content="""You are a helpful assistant drafting WhatsApp replies.
     Use a friendly, professional tone. Keep replies concise, under 200 characters if possible.
     Output plain text. If the message is a question, answer it or use '[YOUR_ANSWER_HERE]' if unknown.""")
     user_msg = HumanMessage(content=f"Message: {message_text}")
-    try:
-        response = llm.invoke([prompt, user_msg])
-        return response.content.strip()
-    except:
-        return "Thanks for your message! I'll get back to you soon."
+    response = llm.invoke([prompt, user_msg])
+    return response.content.strip()
 
 def send_reply(recipient: str, message: str, reply_to_id: str):
-    url = f"https://graph.facebook.com/{VERSION}/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {META_ACCESS_TOKEN}",
-        "Content-Type": "application/json",
-    }
     payload = {
         "messaging_product": "whatsapp",
         "to": recipient,
@@ -89,11 +247,22 @@ def send_reply(recipient: str, message: str, reply_to_id: str):
         "text": {"body": message},
         "context": {"message_id": reply_to_id},
     }
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        print(f"Failed to send reply: {e}")
+    sender.send(PHONE_NUMBER_ID, payload)
+
+# Worker pool; on exit it stops accepting and drains what is already queued.
+# Without coalescing, a job is one message; with it, one burst.
+reply_pool = WorkerPool(process_message, workers=REPLY_WORKERS, maxsize=REPLY_QUEUE_SIZE, name="reply")
+reply_pool.start()
+coalescer = BurstCoalescer(flush_burst, window=COALESCE_WINDOW, max_wait=COALESCE_MAX_WAIT) if COALESCE_WINDOW > 0 else None
+# atexit runs in reverse: flush bursts, drain workers, finish retries, close the dedup store and LLM pool
+atexit.register(llm.close)
+atexit.register(dedup.close)
+atexit.register(sender.shutdown)
+atexit.register(reply_pool.shutdown)
+if coalescer is not None:
+    atexit.register(coalescer.shutdown)
 
 if __name__ == "__main__":
+    # Turn SIGTERM into a normal exit so the atexit drain runs
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     app.run(port=8000)
@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import time
+
+# Replays a message corpus through the reply pipeline against a stub LLM and
+# compares LLM calls, simulated LLM latency and tokens per message for the
+# "combined" and "two_step" reply modes. No network or API keys needed.
+#
+#   python bench_reply_modes.py [--corpus messages.jsonl]   (one {"text": ...} per line)
+
+os.environ.setdefault("DEDUP_DB", "")  # keep the benchmark from writing a dedup database
+
+import Agent  # noqa: E402
+
+SAMPLE_CORPUS = [
+    "hi",
+    "Are you open today?",
+    "What time do you close on Saturdays?",
+    "ok thanks",
+    "Can I book a table for 4 at 7pm tomorrow?",
+    "👍",
+    "Do you deliver to the airport area?",
+    "Is the blue jacket still available in medium?",
+    "lol",
+    "How much is shipping to Canada?",
+    "Thank you so much, see you soon!",
+    "I was charged twice for my last order, can you check?",
+]
+
+class StubResponse:
+    def __init__(self, content):
+        self.content = content
+
+# Latency model: fixed overhead per call plus a cost per input and output token
+class StubLLM:
+    def __init__(self, base_latency=0.25, per_input_token=0.0002, per_output_token=0.01, sleep=False):
+        self.base_latency = base_latency
+        self.per_input_token = per_input_token
+        self.per_output_token = per_output_token
+        self.sleep = sleep
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency = 0.0
+
+    def invoke(self, messages):
+        system, user = messages[0].content, messages[-1].content
+        needs_reply = len(user.split()) > 2
+        reply = "Thanks for reaching out! [YOUR_ANSWER_HERE]"
+        if "needs_reply" in system and "reply" in system.split("needs_reply", 1)[1]:
+            content = json.dumps({"needs_reply": needs_reply, "reply": reply if needs_reply else ""})
+        elif "needs_reply" in system:
+            content = json.dumps({"needs_reply": needs_reply})
+        else:
+            content = reply
+        input_tokens = sum(len(m.content) for m in messages) // 4
+        output_tokens = max(1, len(content) // 4)
+        latency = self.base_latency + input_tokens * self.per_input_token + output_tokens * self.per_output_token
+        if self.sleep:
+            time.sleep(latency)
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.latency += latency
+        return StubResponse(content)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus")
+    parser.add_argument("--sleep", action="store_true", help="actually sleep for the simulated latency")
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = [json.loads(line)["text"] for line in f if line.strip()]
+    else:
+        corpus = SAMPLE_CORPUS
+
+    stub = StubLLM(sleep=args.sleep)
+    Agent.llm = stub
+    print(f"{len(corpus)} messages")
+    for mode in ("two_step", "combined"):
+        Agent.REPLY_MODE = mode
+        stub.reset()
+        replies = sum(1 for text in corpus if Agent.draft_reply(text))
+        n = len(corpus)
+        print(f"{mode:<9} replies {replies:3d}  calls/msg {stub.calls / n:5.2f}  "
+              f"LLM latency/msg {stub.latency / n * 1000:7.1f} ms  "
+              f"tokens/msg in {stub.input_tokens / n:6.1f} out {stub.output_tokens / n:5.1f}")
+    Agent.reply_pool.shutdown()
@@ -0,0 +1,72 @@
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sender import WhatsAppSender
+
+# Drives WhatsAppSender against a local stub of the Graph API messages endpoint
+# that fails a configurable share of requests with 429/503, and reports send
+# latency, retries and dead letters. No network or Meta credentials needed.
+#
+#   python bench_sender.py --messages 500 --failure-rate 0.2
+
+class StubGraphAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    failure_rate = 0.0
+    latency = 0.005
+    received = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            status, body = random.choice([429, 503]), b'{"error": {"message": "try later"}}'
+        else:
+            with StubGraphAPI.lock:
+                StubGraphAPI.received += 1
+            status, body = 200, json.dumps({"messages": [{"id": "wamid.stub"}]}).encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0.05")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--failure-rate", type=float, default=0.2)
+    parser.add_argument("--rate", type=float, default=200.0, help="sends per second per phone number")
+    args = parser.parse_args()
+
+    StubGraphAPI.failure_rate = args.failure_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGraphAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    sender = WhatsAppSender("stub-token", base_url=f"http://127.0.0.1:{server.server_address[1]}",
+                            rate_per_second=args.rate, burst=args.rate, base_delay=0.05, max_delay=1.0)
+    payload = {"messaging_product": "whatsapp", "to": "15550000000", "type": "text", "text": {"body": "hi"}}
+    started = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(lambda _: sender.send("stub-phone", payload), range(args.messages)))
+    sender.shutdown(timeout=30)
+    elapsed = time.monotonic() - started
+    server.shutdown()
+
+    print(f"{args.messages} messages in {elapsed:.2f}s ({args.messages / elapsed:.0f}/s), delivered {StubGraphAPI.received}")
+    print(json.dumps(sender.stats(), indent=2))
@@ -0,0 +1,93 @@
+import threading
+import time
+
+# Per-sender debounce: messages from one sender are buffered until they go
+# quiet for `window` seconds (or `max_wait` after the first one, or
+# `max_messages` arrive), then handed to `flush(sender, messages)` as one burst.
+
+class BurstCoalescer:
+    def __init__(self, flush, window=2.0, max_wait=10.0, max_messages=10):
+        self.flush = flush
+        self.window = window
+        self.max_wait = max_wait
+        self.max_messages = max_messages
+        self.buffers = {}  # sender -> {"messages": [...], "first_at": t, "last_at": t}
+        self.cond = threading.Condition()
+        self.counts = {"messages": 0, "bursts": 0}
+        self.buffered = 0  # messages held in buffers or being flushed
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="coalescer", daemon=True)
+        self.thread.start()
+
+    def _due_at(self, buffer):
+        if len(buffer["messages"]) >= self.max_messages:
+            return 0.0
+        return min(buffer["last_at"] + self.window, buffer["first_at"] + self.max_wait)
+
+    def add(self, sender, message):
+        now = time.monotonic()
+        with self.cond:
+            buffer = self.buffers.get(sender)
+            if buffer is None:
+                buffer = self.buffers[sender] = {"messages": [], "first_at": now, "last_at": now}
+            buffer["messages"].append(message)
+            buffer["last_at"] = now
+            self.counts["messages"] += 1
+            self.buffered += 1
+            self.cond.notify()
+
+    def _take_due(self, now):
+        due = [sender for sender, buffer in self.buffers.items() if self._due_at(buffer) <= now]
+        return [(sender, self.buffers.pop(sender)["messages"]) for sender in due]
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running:
+                    now = time.monotonic()
+                    ready = self._take_due(now)
+                    if ready:
+                        break
+                    next_due = min((self._due_at(b) for b in self.buffers.values()), default=None)
+                    self.cond.wait(None if next_due is None else max(0.0, next_due - now))
+                else:
+                    return
+            self._emit(ready)
+
+    def _emit(self, ready):
+        for sender, messages in ready:
+            with self.cond:
+                self.counts["bursts"] += 1
+            try:
+                self.flush(sender, messages)
+            except Exception as e:
+                print(f"Failed to flush messages from {sender}: {e}")
+            finally:
+                with self.cond:
+                    self.buffered -= len(messages)
+
+    # Messages accepted but not yet handed on; callers count these against
+    # downstream capacity since the burst buffers themselves are unbounded
+    def pending(self):
+        with self.cond:
+            return self.buffered
+
+    # Flush everything still buffered and stop the timer thread
+    def shutdown(self):
+        with self.cond:
+            self.running = False
+            ready = [(sender, buffer["messages"]) for sender, buffer in self.buffers.items()]
+            self.buffers.clear()
+            self.cond.notify_all()
+        self.thread.join()
+        self._emit(ready)
+
+    def stats(self):
+        with self.cond:
+            bursts = self.counts["bursts"]
+            return {
+                **self.counts,
+                "pending_senders": len(self.buffers),
+                "pending_messages": self.buffered,
+                "messages_per_burst": round(self.counts["messages"] / bursts, 2) if bursts else None,
+            }
@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Bounded TTL/LRU set of message ids that are queued or already handled, so
+# webhook redeliveries are dropped before they reach the LLM. With a path, ids
+# are also written to SQLite and the most recent processed ones reloaded on
+# startup, so a restart doesn't forget them. Claims still in flight when the
+# previous process died are discarded, so Meta's redelivery of those messages
+# is processed rather than dropped as a duplicate.
+
+IN_FLIGHT = "in_flight"
+PROCESSED = "processed"
+
+class DedupStore:
+    def __init__(self, max_entries=10000, ttl=24 * 3600, path=None, prune_every=500):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.prune_every = prune_every
+        self.entries = OrderedDict()  # message id -> (state, expires_at)
+        self.lock = threading.Lock()
+        self.counts = {"claimed": 0, "suppressed": 0, "released": 0, "evicted": 0}
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_messages (id TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.conn.execute("DELETE FROM seen_messages WHERE expires_at <= ?", (time.time(),))
+            self.conn.execute("DELETE FROM seen_messages WHERE state = ?", (IN_FLIGHT,))
+            self.conn.commit()
+            rows = self.conn.execute(
+                "SELECT id, state, expires_at FROM seen_messages WHERE state = ? ORDER BY expires_at DESC LIMIT ?",
+                (PROCESSED, max_entries),
+            ).fetchall()
+            for message_id, state, expires_at in reversed(rows):
+                self.entries[message_id] = (state, expires_at)
+
+    def _remember(self, message_id, state, expires_at):
+        self.entries[message_id] = (state, expires_at)
+        self.entries.move_to_end(message_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counts["evicted"] += 1
+        if self.conn is not None:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO seen_messages (id, state, expires_at) VALUES (?, ?, ?)",
+                (message_id, state, expires_at),
+            )
+            if self.counts["claimed"] % self.prune_every == 0:
+                self.conn.execute("DELETE FROM seen_messages WHERE expires_at <= ?", (time.time(),))
+            self.conn.commit()
+
+    def _seen(self, message_id, now):
+        entry = self.entries.get(message_id)
+        if entry is not None:
+            if entry[1] > now:
+                return True
+            del self.entries[message_id]
+            return False
+        # Only ids evicted from memory but still within their TTL reach the disk
+        if self.conn is not None:
+            row = self.conn.execute(
+                "SELECT 1 FROM seen_messages WHERE id = ? AND expires_at > ?", (message_id, now)
+            ).fetchone()
+            return row is not None
+        return False
+
+    # Returns True if the caller should process the message, False for a duplicate
+    def claim(self, message_id):
+        now = time.time()
+        with self.lock:
+            if self._seen(message_id, now):
+                self.counts["suppressed"] += 1
+                return False
+            self.counts["claimed"] += 1
+            self._remember(message_id, IN_FLIGHT, now + self.ttl)
+            return True
+
+    def complete(self, message_id):
+        with self.lock:
+            self._remember(message_id, PROCESSED, time.time() + self.ttl)
+
+    # Forget a claim whose message was never queued, so a redelivery is processed
+    def release(self, message_id):
+        with self.lock:
+            self.entries.pop(message_id, None)
+            self.counts["released"] += 1
+            if self.conn is not None:
+                self.conn.execute("DELETE FROM seen_messages WHERE id = ?", (message_id,))
+                self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            in_flight = sum(1 for state, _ in self.entries.values() if state == IN_FLIGHT)
+            return {**self.counts, "entries": len(self.entries), "in_flight": in_flight, "max_entries": self.max_entries}
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
@@ -0,0 +1,55 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Memory-bounded TTL/LRU cache of reply decisions keyed on normalized message
+# text, so word-for-word repeat questions skip the LLM.
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+def normalize(text):
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+class ReplyCache:
+    def __init__(self, max_entries=1000, ttl=6 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # normalized text -> (reply or None, expires_at)
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "evictions": 0}
+
+    # Returns (hit, reply); a cached None means "no reply needed"
+    def get(self, text):
+        key = normalize(text)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.counts["hits"] += 1
+                return True, entry[0]
+            if entry is not None:
+                del self.entries[key]
+            self.counts["misses"] += 1
+            return False, None
+
+    def put(self, text, reply):
+        key = normalize(text)
+        if not key:
+            return
+        with self.lock:
+            self.entries[key] = (reply, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counts["evictions"] += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counts["hits"] + self.counts["misses"]
+            return {
+                **self.counts,
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self.counts["hits"] / lookups, 3) if lookups else None,
+            }
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Outbound delivery for Graph API messages: one pooled keep-alive session, a
+# token bucket per sending phone number, and retries with jittered exponential
+# backoff on 429/5xx and connection errors. Retries wait on a bounded queue run
+# by a background thread, so callers never sleep; messages that run out of
+# attempts (or don't fit in the queue) go to a bounded dead-letter list.
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Takes a token if one is free; otherwise returns how long until one is
+    def try_acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.try_acquire()
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+class WhatsAppSender:
+    def __init__(self, access_token, base_url="https://graph.facebook.com", version="v18.0",
+                 rate_per_second=20.0, burst=20, max_attempts=5, base_delay=0.5, max_delay=30.0,
+                 timeout=10.0, retry_queue_size=1000, dead_letter_size=1000, pool_size=16, latency_samples=1000):
+        self.base_url = base_url.rstrip("/")
+        self.version = version
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.retry_queue_size = retry_queue_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        })
+
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.retry_cond = threading.Condition(self.lock)
+        self.retries = []  # heap of (due_at, seq, item)
+        self.seq = itertools.count()
+        self.retrying = 0  # retries popped off the heap whose attempt is still running
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self.latencies = deque(maxlen=latency_samples)
+        self.counts = {"sent": 0, "attempts": 0, "retried": 0, "dead_lettered": 0}
+        self.running = True
+        self.retry_thread = threading.Thread(target=self._retry_loop, name="sender-retry", daemon=True)
+        self.retry_thread.start()
+
+    def _bucket(self, phone_number_id):
+        with self.lock:
+            bucket = self.buckets.get(phone_number_id)
+            if bucket is None:
+                bucket = self.buckets[phone_number_id] = TokenBucket(self.rate_per_second, self.burst)
+            return bucket
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _attempt(self, item):
+        self._bucket(item["phone_number_id"]).acquire()
+        url = f"{self.base_url}/{self.version}/{item['phone_number_id']}/messages"
+        started = time.monotonic()
+        retry_after = None
+        try:
+            response = self.session.post(url, json=item["payload"], timeout=self.timeout)
+            status = response.status_code
+            if status in RETRYABLE_STATUS:
+                header = response.headers.get("Retry-After")
+                retry_after = float(header) if header and header.replace(".", "", 1).isdigit() else None
+            error = None if response.ok else f"HTTP {status}: {response.text[:200]}"
+            retryable = status in RETRYABLE_STATUS
+        except requests.exceptions.RequestException as e:
+            error, retryable = str(e), True
+        with self.lock:
+            self.counts["attempts"] += 1
+            self.latencies.append(time.monotonic() - started)
+        item["attempt"] += 1
+        if error is None:
+            with self.lock:
+                self.counts["sent"] += 1
+            return True
+        item["last_error"] = error
+        if retryable and item["attempt"] < self.max_attempts:
+            self._schedule_retry(item, self._backoff(item["attempt"], retry_after))
+        else:
+            self._dead_letter(item)
+        return False
+
+    def _schedule_retry(self, item, delay):
+        with self.retry_cond:
+            if len(self.retries) >= self.retry_queue_size or not self.running:
+                full = True
+            else:
+                full = False
+                heapq.heappush(self.retries, (time.monotonic() + delay, next(self.seq), item))
+                self.counts["retried"] += 1
+                self.retry_cond.notify()
+        if full:
+            self._dead_letter(item)
+
+    def _dead_letter(self, item):
+        print(f"Failed to send reply after {item['attempt']} attempt(s): {item.get('last_error')}")
+        with self.lock:
+            self.counts["dead_lettered"] += 1
+            self.dead_letters.append({**item, "failed_at": time.time()})
+
+    def _retry_loop(self):
+        while True:
+            with self.retry_cond:
+                while self.running and (not self.retries or self.retries[0][0] > time.monotonic()):
+                    self.retry_cond.wait(self.retries[0][0] - time.monotonic() if self.retries else None)
+                if not self.running:
+                    return
+                _, _, item = heapq.heappop(self.retries)
+                self.retrying += 1
+            try:
+                self._attempt(item)
+            finally:
+                with self.retry_cond:
+                    self.retrying -= 1
+
+    # Sends now; a retryable failure is retried in the background. Returns
+    # whether the first attempt succeeded.
+    def send(self, phone_number_id, payload):
+        return self._attempt({"phone_number_id": phone_number_id, "payload": payload, "attempt": 0})
+
+    def shutdown(self, timeout=10.0):
+        # Give due retries, and any attempt already in flight, a chance to go
+        # out; then dead-letter whatever is left
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if not self.retrying and (not self.retries or self.retries[0][0] > deadline):
+                    break
+            time.sleep(0.05)
+        with self.retry_cond:
+            self.running = False
+            leftover = [item for _, _, item in self.retries]
+            self.retries.clear()
+            self.retry_cond.notify_all()
+        for item in leftover:
+            self._dead_letter(item)
+        self.retry_thread.join(max(0.0, deadline - time.monotonic()))
+        self.session.close()
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {**self.counts, "retry_queue_depth": len(self.retries), "dead_letter_size": len(self.dead_letters)}
+        for pct in (50, 95, 99):
+            stats[f"send_p{pct}_ms"] = round(latencies[min(len(latencies) - 1, len(latencies) * pct // 100)] * 1000, 1) if latencies else None
+        return stats
@@ -0,0 +1,105 @@
+import queue
+import threading
+import time
+from collections import deque
+
+# Bounded job queue drained by a fixed pool of worker threads. submit() never
+# blocks for long: when the queue is full it returns False so the caller can
+# push back (the webhook answers 503 and Meta redelivers later).
+
+_STOP = object()
+
+class WorkerPool:
+    def __init__(self, handler, workers=4, maxsize=1000, name="worker", latency_samples=1000):
+        self.handler = handler
+        self.workers = workers
+        self.name = name
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.threads = []
+        self.accepting = False
+        self.lock = threading.Lock()
+        self.counts = {"submitted": 0, "rejected": 0, "processed": 0, "failed": 0}
+        self.busy = 0
+        # Recent (queue wait, processing time) pairs in seconds
+        self.samples = deque(maxlen=latency_samples)
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            self.accepting = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    # `reserved` counts jobs already promised to the queue but not yet submitted
+    def has_capacity(self, reserved=0):
+        if not self.accepting:
+            return False
+        return self.queue.maxsize <= 0 or self.queue.qsize() + reserved < self.queue.maxsize
+
+    def submit(self, job, timeout=0.05):
+        if not self.accepting:
+            return False
+        try:
+            self.queue.put((time.monotonic(), job), timeout=timeout)
+        except queue.Full:
+            with self.lock:
+                self.counts["rejected"] += 1
+            return False
+        with self.lock:
+            self.counts["submitted"] += 1
+        return True
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                return
+            enqueued_at, job = item
+            started = time.monotonic()
+            with self.lock:
+                self.busy += 1
+            try:
+                self.handler(job)
+                outcome = "processed"
+            except Exception as e:
+                print(f"Failed to process job: {e}")
+                outcome = "failed"
+            finally:
+                finished = time.monotonic()
+                with self.lock:
+                    self.busy -= 1
+                    self.counts[outcome] += 1
+                    self.samples.append((started - enqueued_at, finished - started))
+                self.queue.task_done()
+
+    # Stop accepting, let queued jobs finish, then stop the workers
+    def shutdown(self, timeout=30.0):
+        with self.lock:
+            if not self.accepting:
+                return
+            self.accepting = False
+        deadline = time.monotonic() + timeout
+        for _ in self.threads:
+            # A full queue drains as workers finish, so this only waits on real work
+            try:
+                self.queue.put(_STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for thread in self.threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self.lock:
+            samples = list(self.samples)
+            stats = {**self.counts, "queue_depth": self.queue.qsize(), "queue_capacity": self.queue.maxsize,
+                     "busy_workers": self.busy, "workers": self.workers}
+        for label, index in (("queue_wait", 0), ("processing", 1)):
+            values = sorted(sample[index] for sample in samples)
+            for pct in (50, 95, 99):
+                key = f"{label}_p{pct}_ms"
+                stats[key] = round(values[min(len(values) - 1, len(values) * pct // 100)] * 1000, 1) if values else None
+        return stats